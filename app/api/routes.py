@@ -1,7 +1,14 @@
+import asyncio
 from fastapi import APIRouter, HTTPException, status
-from app.schemas import SummarizeRequest, SummarizeResponse
-from app.services.summarize import process_menu_request, get_cache_stats
-from app.fetch.scraper import fetch_html_with_js_fallback, extract_menu_text
+from app.schemas import (
+    SummarizeRequest,
+    SummarizeResponse,
+    SummarizeBatchRequest,
+    SummarizeBatchItem,
+    SummarizeBatchResponse
+)
+from app.services.summarize import process_menu_request, process_menu_requests, get_cache_stats
+from app.fetch.scraper import fetch_html_with_js_fallback, menu_text_from_tree, detect_spa_markers
 
 router = APIRouter()
 
@@ -34,51 +41,83 @@ async def summarize_menu(request: SummarizeRequest):
             detail=str(e)
         )
 
+@router.post("/summarize-batch", response_model=SummarizeBatchResponse)
+async def summarize_menu_batch(request: SummarizeBatchRequest):
+    """
+    Summarize several restaurant menus concurrently.
+    
+    At most BATCH_MAX_CONCURRENCY URLs are processed at once. A failing URL
+    is reported in its own result and does not fail the whole batch.
+    """
+    if not request.urls:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="At least one URL is required"
+        )
+    
+    valid_urls = [url for url in request.urls if url.startswith(("http://", "https://"))]
+    processed = dict(zip(valid_urls, await process_menu_requests(valid_urls)))
+    
+    results = []
+    for url in request.urls:
+        result = processed.get(url)
+        if result is None:
+            results.append(SummarizeBatchItem(url=url, error="URL must start with http:// or https://"))
+        elif isinstance(result, Exception):
+            results.append(SummarizeBatchItem(url=url, error=str(result)))
+        else:
+            results.append(SummarizeBatchItem(url=url, **result))
+    return SummarizeBatchResponse(results=results)
+
+def _debug_analyze(html: str) -> dict:
+    """Parse the page once and run the HTML analyzers on it for debug_scrape."""
+    from app.fetch.html_analyzer import (
+        should_use_html_mode, 
+        extract_date_info_from_html,
+        clean_html_for_llm,
+        clean_body_text_for_llm
+    )
+    from app.fetch.dom import parse_html
+    
+    # Parse once and share the tree between the analyzers
+    tree = parse_html(html)
+    use_html = should_use_html_mode(html, tree=tree)
+    date_info = extract_date_info_from_html(html, tree=tree)
+    # The cleaners work on their own copies of the tree
+    cleaned_body = clean_body_text_for_llm(html, tree=tree)
+    cleaned_html = clean_html_for_llm(html, tree=tree) if use_html else None
+    # Menu extraction strips the tree in place, so it goes last
+    extracted_text = menu_text_from_tree(tree)
+    
+    # Check for SPA markers
+    spa_markers = detect_spa_markers(html)
+    
+    result = {
+        "html_length": len(html),
+        "extracted_text_length": len(extracted_text),
+        "cleaned_body_length": len(cleaned_body),
+        "should_use_html_mode": use_html,
+        "spa_markers": spa_markers,
+        "date_analysis": date_info,
+        "extracted_text_preview": extracted_text[:1000] + "..." if len(extracted_text) > 1000 else extracted_text,
+        "cleaned_body_preview": cleaned_body[:1500] + "..." if len(cleaned_body) > 1500 else cleaned_body
+    }
+    
+    if use_html:
+        result["cleaned_html_length"] = len(cleaned_html)
+        result["cleaned_html_preview"] = cleaned_html[:1000] + "..." if len(cleaned_html) > 1000 else cleaned_html
+    
+    return result
+
 @router.post("/debug-scrape")
 async def debug_scrape(request: SummarizeRequest):
     """Debug endpoint to see what text is extracted from URL"""
     try:
         html = await fetch_html_with_js_fallback(request.url)
-        extracted_text = extract_menu_text(html)
         
-        # Also test HTML analysis
-        from app.fetch.html_analyzer import (
-            should_use_html_mode, 
-            extract_date_info_from_html,
-            clean_html_for_llm,
-            clean_body_text_for_llm
-        )
-        
-        use_html = should_use_html_mode(html)
-        date_info = extract_date_info_from_html(html)
-        cleaned_body = clean_body_text_for_llm(html)
-        
-        # Check for SPA markers
-        spa_markers = {
-            "has_next_js": 'id="__next"' in html or '__NEXT_DATA__' in html,
-            "has_react": 'data-reactroot' in html.lower(),
-            "has_nuxt": 'window.__NUXT__' in html,
-            "has_angular": 'ng-version' in html
-        }
-        
-        result = {
-            "url": request.url,
-            "html_length": len(html),
-            "extracted_text_length": len(extracted_text),
-            "cleaned_body_length": len(cleaned_body),
-            "should_use_html_mode": use_html,
-            "spa_markers": spa_markers,
-            "date_analysis": date_info,
-            "extracted_text_preview": extracted_text[:1000] + "..." if len(extracted_text) > 1000 else extracted_text,
-            "cleaned_body_preview": cleaned_body[:1500] + "..." if len(cleaned_body) > 1500 else cleaned_body
-        }
-        
-        if use_html:
-            cleaned_html = clean_html_for_llm(html)
-            result["cleaned_html_length"] = len(cleaned_html)
-            result["cleaned_html_preview"] = cleaned_html[:1000] + "..." if len(cleaned_html) > 1000 else cleaned_html
-            
-        return result
+        # Parsing and analysis are CPU-bound, so run them off the event loop
+        analysis = await asyncio.to_thread(_debug_analyze, html)
+        return {"url": request.url, **analysis}
     except Exception as e:
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
@@ -93,21 +132,19 @@ async def debug_js_render(request: SummarizeRequest):
         from app.fetch.js_scraper import fetch_js_html
         from app.fetch.html_analyzer import clean_body_text_for_llm
         
-        # Get static HTML
-        static_html = await fetch_html(request.url)
-        static_cleaned = clean_body_text_for_llm(static_html)
-        
-        # Get JS-rendered HTML
-        js_html = await fetch_js_html(request.url)
-        js_cleaned = clean_body_text_for_llm(js_html)
+        # Get static and JS-rendered HTML concurrently
+        static_html, js_html = await asyncio.gather(
+            fetch_html(request.url),
+            fetch_js_html(request.url)
+        )
+        # Parsing is CPU-bound, so clean both pages off the event loop
+        static_cleaned, js_cleaned = await asyncio.gather(
+            asyncio.to_thread(clean_body_text_for_llm, static_html),
+            asyncio.to_thread(clean_body_text_for_llm, js_html)
+        )
         
         # Check for SPA markers
-        spa_markers_static = {
-            "has_next_js": 'id="__next"' in static_html or '__NEXT_DATA__' in static_html,
-            "has_react": 'data-reactroot' in static_html.lower(),
-            "has_nuxt": 'window.__NUXT__' in static_html,
-            "has_angular": 'ng-version' in static_html
-        }
+        spa_markers_static = detect_spa_markers(static_html)
         
         return {
             "url": request.url,
@@ -137,14 +174,14 @@ async def debug_js_render(request: SummarizeRequest):
 @router.get("/cache/stats")
 async def cache_statistics():
     """Get cache statistics for debugging"""
-    return get_cache_stats()
+    return await get_cache_stats()
 
 @router.delete("/cache/clear")
 async def clear_cache():
     """Clear all cache entries"""
     try:
-        from app.cache.db import clear_all
-        clear_all()
+        from app.cache.db import aclear_all
+        await aclear_all()
         return {"message": "Cache cleared successfully"}
     except Exception as e:
         raise HTTPException(
@@ -152,6 +189,16 @@ async def clear_cache():
             detail=f"Failed to clear cache: {str(e)}"
         )
 
+@router.get("/metrics")
+async def metrics():
+    """Runtime counters (JS rendering context pool)"""
+    try:
+        from app.fetch.js_scraper import context_pool_stats
+        js_contexts = context_pool_stats()
+    except ImportError:
+        js_contexts = {"error": "Playwright not available"}
+    return {"js_contexts": js_contexts}
+
 @router.get("/health")
 async def health_check():
     """Health check endpoint"""
@@ -1,73 +1,253 @@
+import asyncio
 import sqlite3
 import json
 import os
+import threading
+import time
+import zlib
+from collections import OrderedDict
 from datetime import datetime, date
-from typing import Optional
+from typing import Optional, Tuple
 from app.core.config import settings
 
 DATABASE_PATH = settings.DATABASE_PATH
 
+# Applied once per connection: WAL lets readers run alongside the writer,
+# the rest keeps temp data and hot pages in memory
+_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",
+    "PRAGMA synchronous=NORMAL",
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA cache_size=-64000",
+    "PRAGMA mmap_size=268435456",
+)
+
+# Payloads are stored zlib-compressed as BLOBs; rows written before
+# compression was added are plain TEXT and get rewritten on first read
+_COMPRESS_LEVEL = 6
+# Preset dictionary with the menu JSON vocabulary, so even short payloads
+# compress well. Rows written with it can only be read with these exact
+# bytes (zlib checks the dictionary id), so only ever append a new one.
+# Streams compressed without a dictionary still decompress with it.
+_ZDICT = (
+    '"weight":null,"weight":"g","ml","allergens":[],"price":null,'
+    '"category":"nápoj","dezert","salát","příloha","hlavní chod","polévka",'
+    '"name":"","menu_items":[{'
+    '"source_url":"https://","daily_menu":false,"daily_menu":true,'
+    '"day_of_week":"pondělí","úterý","středa","čtvrtek","pátek","sobota","neděle",'
+    '{"restaurant_name":"Restaurace ","date":"'
+).encode("utf-8")
+
+_PURGE_BATCH_SIZE = 500
+
+# sqlite3 keeps compiled statements per connection, keyed by the SQL text;
+# fixed strings with ? placeholders are compiled once, while SQL built per
+# call (f-strings with values inlined) would be recompiled every time
+_SQL_GET = "SELECT payload FROM cache WHERE menu_url = ? AND date = ?"
+# Update in place on conflict; OR REPLACE deletes and reinserts the row
+_SQL_SET = (
+    "INSERT INTO cache (menu_url, date, payload) VALUES (?, ?, ?) "
+    "ON CONFLICT(menu_url, date) DO UPDATE SET "
+    "payload = excluded.payload, created_at = CURRENT_TIMESTAMP"
+)
+_SQL_REWRITE = "UPDATE cache SET payload = ? WHERE menu_url = ? AND date = ? AND payload = ?"
+_SQL_PURGE_BATCH = (
+    "DELETE FROM cache WHERE rowid IN "
+    "(SELECT rowid FROM cache WHERE date < ? LIMIT ?)"
+)
+_SQL_CLEAR = "DELETE FROM cache"
+_SQL_COUNT = "SELECT COUNT(*) FROM cache"
+_SQL_COUNT_DATE = "SELECT COUNT(*) FROM cache WHERE date = ?"
+# Room for every statement above plus the schema/pragma ones
+_CACHED_STATEMENTS = 256
+
+_conn: Optional[sqlite3.Connection] = None
+_conn_path: Optional[str] = None
+_conn_lock = threading.Lock()
+_write_lock = threading.Lock()
+
+# Hot entries kept in process, so repeated hits skip SQLite and zlib;
+# each uvicorn worker has its own copy, bounded by MEMORY_CACHE_TTL_SECONDS
+_mem: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+_mem_lock = threading.Lock()
+
+def _mem_get(url: str, date_str: str) -> Optional[str]:
+    key = (url, date_str)
+    with _mem_lock:
+        entry = _mem.get(key)
+        if entry is None:
+            return None
+        stored_at, payload = entry
+        if time.monotonic() - stored_at > settings.MEMORY_CACHE_TTL_SECONDS:
+            del _mem[key]
+            return None
+        _mem.move_to_end(key)
+        return payload
+
+def _mem_put(url: str, date_str: str, payload: str):
+    if settings.MEMORY_CACHE_SIZE <= 0:
+        return
+    with _mem_lock:
+        _mem[(url, date_str)] = (time.monotonic(), payload)
+        _mem.move_to_end((url, date_str))
+        while len(_mem) > settings.MEMORY_CACHE_SIZE:
+            _mem.popitem(last=False)
+
+def _mem_clear():
+    with _mem_lock:
+        _mem.clear()
+
+def _connection() -> sqlite3.Connection:
+    """Return the shared connection, (re)opening it if DATABASE_PATH changed"""
+    global _conn, _conn_path
+    if _conn is not None and _conn_path == DATABASE_PATH:
+        return _conn
+    with _conn_lock:
+        if _conn is None or _conn_path != DATABASE_PATH:
+            if _conn is not None:
+                _conn.close()
+            _mem_clear()
+            # A larger statement cache keeps every query here compiled for the
+            # connection's lifetime
+            conn = sqlite3.connect(
+                DATABASE_PATH, check_same_thread=False, isolation_level=None,
+                cached_statements=_CACHED_STATEMENTS
+            )
+            for pragma in _PRAGMAS:
+                conn.execute(pragma)
+            _conn, _conn_path = conn, DATABASE_PATH
+        return _conn
+
+def close_db():
+    """Close the shared connection (on shutdown or before removing the file)"""
+    global _conn, _conn_path
+    with _conn_lock:
+        if _conn is not None:
+            _conn.close()
+        _conn, _conn_path = None, None
+    _mem_clear()
+
 def init_db():
     """Initialize SQLite database with cache table"""
     os.makedirs(os.path.dirname(DATABASE_PATH), exist_ok=True)
-    
-    with sqlite3.connect(DATABASE_PATH) as conn:
+
+    conn = _connection()
+    with _write_lock:
         conn.execute("""
             CREATE TABLE IF NOT EXISTS cache (
                 menu_url TEXT NOT NULL,
                 date TEXT NOT NULL,
-                payload TEXT NOT NULL,
+                payload BLOB NOT NULL,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
                 UNIQUE(menu_url, date)
             )
         """)
-        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_url_date ON cache(menu_url, date)")
-        conn.commit()
+        # UNIQUE(menu_url, date) already backs lookups and upserts with its own
+        # index; this duplicate only added a second B-tree to every write
+        conn.execute("DROP INDEX IF EXISTS idx_cache_url_date")
+        # Lets purge_old find expired rows without a table scan
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_date ON cache(date)")
+
+def _compress(payload: str) -> bytes:
+    compressor = zlib.compressobj(_COMPRESS_LEVEL, zdict=_ZDICT)
+    return compressor.compress(payload.encode("utf-8")) + compressor.flush()
+
+def _decompress(stored: bytes) -> str:
+    decompressor = zlib.decompressobj(zdict=_ZDICT)
+    return (decompressor.decompress(stored) + decompressor.flush()).decode("utf-8")
 
 def get(url: str, date_str: str) -> Optional[str]:
     """Get cached menu data for URL and date"""
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        cursor = conn.execute(
-            "SELECT payload FROM cache WHERE menu_url = ? AND date = ?",
-            (url, date_str)
-        )
-        result = cursor.fetchone()
-        return result[0] if result else None
+    conn = _connection()
+    payload = _mem_get(url, date_str)
+    if payload is not None:
+        return payload
+    cursor = conn.execute(_SQL_GET, (url, date_str))
+    result = cursor.fetchone()
+    if not result:
+        return None
+    stored = result[0]
+    if isinstance(stored, str):
+        # Legacy uncompressed row
+        _rewrite_compressed(url, date_str, stored)
+        payload = stored
+    else:
+        payload = _decompress(stored)
+    _mem_put(url, date_str, payload)
+    return payload
+
+def _rewrite_compressed(url: str, date_str: str, payload: str):
+    """Replace a legacy TEXT payload in place with its compressed form"""
+    conn = _connection()
+    with _write_lock:
+        conn.execute(_SQL_REWRITE, (_compress(payload), url, date_str, payload))
 
 def set(url: str, date_str: str, payload: str):
     """Cache menu data for URL and date"""
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        conn.execute(
-            "INSERT OR REPLACE INTO cache (menu_url, date, payload) VALUES (?, ?, ?)",
-            (url, date_str, payload)
-        )
-        conn.commit()
+    conn = _connection()
+    with _write_lock:
+        conn.execute(_SQL_SET, (url, date_str, _compress(payload)))
+    _mem_put(url, date_str, payload)
 
 def purge_old(today_str: str):
     """Remove cache entries older than today"""
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        conn.execute("DELETE FROM cache WHERE date < ?", (today_str,))
-        conn.commit()
+    conn = _connection()
+    # Delete in small autocommitted batches so writers are never held up for long
+    while True:
+        with _write_lock:
+            deleted = conn.execute(_SQL_PURGE_BATCH, (today_str, _PURGE_BATCH_SIZE)).rowcount
+        if deleted < _PURGE_BATCH_SIZE:
+            break
+    with _mem_lock:
+        for key in [key for key in _mem if key[1] < today_str]:
+            del _mem[key]
 
 def clear_all():
     """Clear all cache entries (for testing)"""
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        conn.execute("DELETE FROM cache")
-        conn.commit()
+    conn = _connection()
+    with _write_lock:
+        conn.execute(_SQL_CLEAR)
+    _mem_clear()
+
+async def aget(url: str, date_str: str) -> Optional[str]:
+    """Async get() that runs the query in a worker thread"""
+    # Memory hits are answered on the loop, without the thread hop; a
+    # changed DATABASE_PATH goes through get() so the stale memory is dropped
+    if _conn is not None and _conn_path == DATABASE_PATH:
+        payload = _mem_get(url, date_str)
+        if payload is not None:
+            return payload
+    return await asyncio.to_thread(get, url, date_str)
+
+async def aset(url: str, date_str: str, payload: str):
+    """Async set() that runs the write in a worker thread"""
+    await asyncio.to_thread(set, url, date_str, payload)
+
+async def apurge_old(today_str: str):
+    """Async purge_old() that runs the delete in a worker thread"""
+    await asyncio.to_thread(purge_old, today_str)
+
+async def aclear_all():
+    """Async clear_all() that runs the delete in a worker thread"""
+    await asyncio.to_thread(clear_all)
+
+async def aget_stats() -> dict:
+    """Async get_stats() that runs the counts in a worker thread"""
+    return await asyncio.to_thread(get_stats)
 
 def get_stats() -> dict:
     """Get cache statistics"""
-    with sqlite3.connect(DATABASE_PATH) as conn:
-        cursor = conn.execute("SELECT COUNT(*) FROM cache")
-        total_entries = cursor.fetchone()[0]
-        
-        from app.fetch.utils import today_prague_str
-        today = today_prague_str()
-        cursor = conn.execute("SELECT COUNT(*) FROM cache WHERE date = ?", (today,))
-        today_entries = cursor.fetchone()[0]
-        
-        return {
-            "total_entries": total_entries,
-            "today_entries": today_entries,
-            "database_path": DATABASE_PATH
-        }
+    conn = _connection()
+    cursor = conn.execute(_SQL_COUNT)
+    total_entries = cursor.fetchone()[0]
+
+    from app.fetch.utils import today_prague_str
+    today = today_prague_str()
+    cursor = conn.execute(_SQL_COUNT_DATE, (today,))
+    today_entries = cursor.fetchone()[0]
+
+    return {
+        "total_entries": total_entries,
+        "today_entries": today_entries,
+        "database_path": DATABASE_PATH
+    }
@@ -12,17 +12,29 @@ class Settings:
     
     # Development
     USE_MOCK: bool = os.getenv("USE_MOCK", "0").lower() in ("1", "true", "yes")
+    # Level of the app's loggers; DEBUG also dumps the cleaned page text sent to the LLM
+    LOG_LEVEL: str = os.getenv("LOG_LEVEL", "INFO").upper()
     
     # Scraping
     REQUEST_TIMEOUT: int = int(os.getenv("REQUEST_TIMEOUT", "30"))
     USER_AGENT: str = os.getenv("USER_AGENT", "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36")
+    # Threads shared by blocking work (HTML parsing, SQLite) run off the event loop
+    WORKER_THREADS: int = int(os.getenv("WORKER_THREADS", str(2 * (os.cpu_count() or 1))))
+    # Max URLs processed concurrently by /summarize-batch
+    BATCH_MAX_CONCURRENCY: int = int(os.getenv("BATCH_MAX_CONCURRENCY", "5"))
     # Playwright / JS rendering
     PLAYWRIGHT_HEADLESS: bool = os.getenv("PLAYWRIGHT_HEADLESS", "1").lower() in ("1", "true", "yes")
     JS_WAIT_TIMEOUT_MS: int = int(os.getenv("JS_WAIT_TIMEOUT_MS", "10000"))
     JS_EXTRA_WAIT_MS: int = int(os.getenv("JS_EXTRA_WAIT_MS", "1500"))
+    BROWSER_POOL_RECYCLE_AFTER: int = int(os.getenv("BROWSER_POOL_RECYCLE_AFTER", "100"))
+    JS_CONTEXT_POOL_SIZE: int = int(os.getenv("JS_CONTEXT_POOL_SIZE", "4"))
+    JS_CONTEXT_RECYCLE_AFTER: int = int(os.getenv("JS_CONTEXT_RECYCLE_AFTER", "20"))
     
     # Cache TTL in hours
     CACHE_TTL_HOURS: int = int(os.getenv("CACHE_TTL_HOURS", "24"))
+    # In-process LRU in front of SQLite (per worker)
+    MEMORY_CACHE_SIZE: int = int(os.getenv("MEMORY_CACHE_SIZE", "256"))
+    MEMORY_CACHE_TTL_SECONDS: int = int(os.getenv("MEMORY_CACHE_TTL_SECONDS", "300"))
 
     # LLM timeouts and retries
     LLM_TIMEOUT_SECONDS: int = int(os.getenv("LLM_TIMEOUT_SECONDS", "50"))
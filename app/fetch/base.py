@@ -13,3 +13,7 @@ class FetchResult:
 class BaseFetcher:
     def fetch(self, url: str, timeout_sec: int = 15) -> FetchResult:
         raise NotImplementedError
+
+class AsyncBaseFetcher:
+    async def fetch(self, url: str, timeout_sec: int = 15) -> FetchResult:
+        raise NotImplementedError
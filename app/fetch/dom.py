@@ -0,0 +1,118 @@
+"""
+Raw lxml helpers shared by the fetch modules.
+Covers parsing, text extraction and simple CSS selectors compiled to XPath.
+"""
+
+import re
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from lxml import etree
+from lxml import html as lxml_html
+
+_UTF8_PARSER = lxml_html.HTMLParser(encoding="utf-8")
+
+# Text nodes BeautifulSoup's get_text() returns: script, style and template
+# strings are left out (so are comments and PIs, which are not text nodes)
+_VISIBLE_STRINGS_XPATH = etree.XPath(
+    ".//text()[not(ancestor::script or ancestor::style or ancestor::template)]",
+    smart_strings=False
+)
+
+_ASCII_UPPER = "ABCDEFGHIJKLMNOPQRSTUVWXYZ"
+_ASCII_LOWER = "abcdefghijklmnopqrstuvwxyz"
+
+# tag, .class, #id, [attr*="value" i] and tag[attr*="value" i]
+_SIMPLE_SELECTOR_RE = re.compile(
+    r"""^(?P<tag>[a-z][a-z0-9]*)?(?:\.(?P<cls>[\w-]+)|\#(?P<id>[\w-]+)"""
+    r"""|\[(?P<attr>[\w-]+)\*=["'](?P<value>[^"']+)["']\s+i\])?$""",
+    re.I
+)
+
+
+def parse_html(html: str) -> lxml_html.HtmlElement:
+    """
+    Parse an HTML document into an lxml tree (empty document on blank input).
+    Comments and processing instructions stay in the tree: they separate the
+    text around them, and the text helpers below skip their content.
+    """
+    try:
+        return lxml_html.document_fromstring(html)
+    except ValueError:
+        # lxml refuses str input that carries an XML encoding declaration
+        return lxml_html.document_fromstring(html.encode("utf-8"), parser=_UTF8_PARSER)
+    except etree.ParserError:
+        return lxml_html.document_fromstring("<html><body></body></html>")
+
+
+def body_or_root(tree: lxml_html.HtmlElement) -> lxml_html.HtmlElement:
+    """Return the <body> element, falling back to the document root."""
+    body = tree.find("body")
+    return body if body is not None else tree
+
+
+def attr_contains_ci(attr: str, needle: str) -> str:
+    """XPath predicate equivalent to CSS `[attr*="needle" i]` (needle must be lowercase)."""
+    return f"contains(translate(@{attr}, '{_ASCII_UPPER}', '{_ASCII_LOWER}'), '{needle}')"
+
+
+def has_class(name: str) -> str:
+    """XPath predicate equivalent to CSS `.name`."""
+    return f"contains(concat(' ', normalize-space(@class), ' '), ' {name} ')"
+
+
+def visible_strings(node: lxml_html.HtmlElement) -> List[str]:
+    """The strings BeautifulSoup's `get_text()` joins, in document order."""
+    return _VISIBLE_STRINGS_XPATH(node)
+
+
+def get_text(node: lxml_html.HtmlElement, separator: str = "\n") -> str:
+    """Equivalent of BeautifulSoup's `get_text(separator, strip=True)`."""
+    return separator.join(s for s in (part.strip() for part in visible_strings(node)) if s)
+
+
+def all_text(node: lxml_html.HtmlElement) -> str:
+    """Equivalent of BeautifulSoup's `get_text()` (script/style/template strings excluded)."""
+    return "".join(visible_strings(node))
+
+
+def _parse_simple_selector(selector: str) -> Tuple[Optional[str], Optional[str]]:
+    """Split a simple selector into its tag name and an XPath predicate (either may be None)"""
+    match = _SIMPLE_SELECTOR_RE.match(selector)
+    if not match or not selector:
+        raise ValueError(f"Unsupported selector: {selector!r}")
+    if match["cls"]:
+        predicate = has_class(match["cls"])
+    elif match["id"]:
+        predicate = f"@id='{match['id']}'"
+    elif match["attr"]:
+        predicate = attr_contains_ci(match["attr"], match["value"].lower())
+    else:
+        predicate = None
+    return match["tag"], predicate
+
+
+def _selector_condition(tag: Optional[str], predicate: Optional[str]) -> str:
+    conditions = [c for c in (tag and f"self::{tag}", predicate) if c]
+    return " and ".join(conditions) or "true()"
+
+
+@lru_cache(maxsize=256)
+def compile_selector(selector: str) -> etree.XPath:
+    """
+    Compile a comma-separated list of simple CSS selectors into one XPath.
+    Several selectors are or-ed in a single predicate, so the tree is walked
+    once (a union of paths walks it once per selector and then merges).
+    """
+    parts = [_parse_simple_selector(part.strip()) for part in selector.split(",")]
+    if len(parts) == 1:
+        tag, predicate = parts[0]
+        return etree.XPath(f"descendant::{tag or '*'}" + (f"[{predicate}]" if predicate else ""))
+    return etree.XPath(
+        "descendant::*[" + " or ".join(f"({_selector_condition(*part)})" for part in parts) + "]"
+    )
+
+
+def select(node: lxml_html.HtmlElement, selector: str) -> List[lxml_html.HtmlElement]:
+    """Descendants of `node` matching `selector`, in document order (like `soup.select`)."""
+    return compile_selector(selector)(node)
@@ -3,73 +3,227 @@ HTML analysis utilities for better menu extraction.
 Alternative approach: send HTML directly to LLM for better structure understanding.
 """
 
-from bs4 import BeautifulSoup
+from lxml import etree
+from lxml.html import HtmlElement
+import copy
+import itertools
 import re
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List, Tuple, Iterable, Iterator
 from datetime import datetime
 from app.fetch.utils import CZ_WEEKDAYS
+from app.fetch.scraper import menu_text_from_tree
+from app.fetch.dom import (
+    parse_html, body_or_root, attr_contains_ci, has_class, get_text, all_text, visible_strings,
+    compile_selector
+)
 
+# Raw-markup checks used by should_use_html_mode when no tree is available
+_TABLE_TAG_RE = re.compile(r"<table\b", re.I)
+_LIST_TAG_RE = re.compile(r"<(?:ul|ol)\b", re.I)
+_MENU_ATTR_RE = re.compile(r"""(?:class|id)\s*=\s*["'][^"']*menu""", re.I)
+_PRICE_RE = re.compile(r"\d+[.,]?-?\s*(?:kč|czk|,-)", re.I)
 
-def clean_html_for_llm(html: str, max_length: int = 8000) -> str:
+# clean_html_for_llm
+_HTML_DROP_TAGS = ("script", "style", "nav", "header", "footer", "aside", "noscript")
+_HTML_NOISE_SELECTORS = (
+    '[class*="cookie" i]', '[id*="cookie" i]',
+    '[class*="gdpr" i]', '[id*="gdpr" i]',
+    '[class*="advertisement" i]', '[id*="advertisement" i]',
+    '[class*="banner" i]', '[id*="banner" i]',
+    '.social', '.share', '.newsletter'
+)
+_HTML_NOISE_XPATH = compile_selector(", ".join(_HTML_NOISE_SELECTORS))
+# Focus on likely menu content areas; each group is one combined query,
+# menu-specific containers first, then generic content areas
+_HTML_MENU_XPATHS = tuple(compile_selector(", ".join(group)) for group in (
+    ('[class*="menu" i]', '[id*="menu" i]',
+     '[class*="jidlo" i]', '[id*="jidlo" i]',
+     '[class*="denni" i]', '[id*="denni" i]',
+     '[class*="poledni" i]', '[id*="poledni" i]'),
+    ('main', 'article', '.content', '#content'),
+))
+
+# get_menu_focused_html: priority selector groups for menu content
+_FOCUSED_MENU_XPATHS = tuple(compile_selector(", ".join(group)) for group in (
+    # High priority - specific menu terms
+    ('[class*="menu" i]', '[id*="menu" i]',
+     '[class*="jidelni" i]', '[id*="jidelni" i]',
+     '[class*="denni" i]', '[id*="denni" i]',
+     '[class*="poledni" i]', '[id*="poledni" i]',
+     '[class*="daily" i]', '[id*="daily" i]'),
+
+    # Fallback - content areas and general containers
+    ('main', 'article', 'section[class*="content" i]',
+     '.content', '#content', '.main-content',
+     '.container', '.wrapper'),
+))
+_FOCUSED_DROP_TAGS = ("script", "style", "nav", "footer")
+_FOCUSED_FALLBACK_DROP_TAGS = ("script", "style", "nav", "header", "footer", "aside")
+# Whitespace-only strings are collapsed outside these (BeautifulSoup's rule)
+_ASCII_SPACES = " \n\t\x0c\r"
+_PRESERVE_WHITESPACE_TAGS = ("pre", "textarea")
+# clean_body_text_for_llm: tags to remove completely
+_BODY_DROP_TAGS = (
+    "script", "style", "nav", "header", "footer", "aside", "noscript",
+    "svg", "canvas", "iframe", "link", "meta", "form", "picture",
+    "source", "video", "audio", "button", "input", "select", "textarea",
+    "dialog",
+)
+# parse_and_extract: tags removed by both body cleaning and menu text extraction
+_SHARED_DROP_TAGS = ("script", "style", "nav", "header", "footer")
+# Heuristics for cookie/GDPR/ads/social/newsletter/banners
+_BODY_NOISE_SELECTORS = (
+    '[class*="cookie" i]', '[id*="cookie" i]',
+    '[class*="consent" i]', '[id*="consent" i]',
+    '[class*="gdpr" i]', '[id*="gdpr" i]',
+    '[class*="advert" i]', '[id*="advert" i]',
+    '[class*="banner" i]', '[id*="banner" i]',
+    '.social', '.share', '.newsletter', '.breadcrumbs', '.breadcrumb'
+)
+_BODY_NOISE_XPATH = compile_selector(", ".join(_BODY_NOISE_SELECTORS))
+_MULTI_NEWLINE_RE = re.compile(r"\n{3,}")
+_MULTI_SPACE_RE = re.compile(r"[ \t]{2,}")
+
+# extract_date_info_from_html
+_DATE_PATTERNS = tuple(re.compile(p) for p in (
+    r'\d{1,2}\.\d{1,2}\.\d{4}',  # DD.MM.YYYY
+    r'\d{1,2}\.\d{1,2}\.?',      # DD.MM.
+    r'\d{4}-\d{2}-\d{2}',        # YYYY-MM-DD
+    r'\d{1,2}/\d{1,2}/\d{4}',    # DD/MM/YYYY
+))
+_MENU_INDICATORS = (
+    "denní menu", "daily menu", "menu dne", "dnes",
+    "polední menu", "lunch menu", "týdenní menu",
+    "jídelní lístek", "menu na"
+)
+_META_DATE_WORDS = ("date", "updated", "modified")
+# All date patterns evaluated at each digit in one scan; each optional
+# lookahead group reports where its pattern would match from there
+_ALL_DATES_RE = re.compile(r"(?=\d)" + "".join(
+    f"(?=(?P<d{i}>{pattern.pattern})?)" for i, pattern in enumerate(_DATE_PATTERNS)
+))
+
+
+def _top_level(elements: List[HtmlElement]) -> List[HtmlElement]:
+    """Drop elements nested inside an earlier one (input in document order)"""
+    kept = []
+    for element in elements:
+        if kept and kept[-1] in element.iterancestors():
+            continue
+        kept.append(element)
+    return kept
+
+
+def _collapse_blank_strings(tree: HtmlElement):
+    """Shorten whitespace-only strings to one newline or space, as BeautifulSoup does"""
+    for node in tree.iter():
+        if isinstance(node.tag, str) and node.text and not node.text.strip(_ASCII_SPACES):
+            if not _in_preformatted(node):
+                node.text = "\n" if "\n" in node.text else " "
+        if node.tail and not node.tail.strip(_ASCII_SPACES):
+            parent = node.getparent()
+            if parent is None or not _in_preformatted(parent):
+                node.tail = "\n" if "\n" in node.tail else " "
+
+
+def _in_preformatted(node: HtmlElement) -> bool:
+    return node.tag in _PRESERVE_WHITESPACE_TAGS or any(
+        ancestor.tag in _PRESERVE_WHITESPACE_TAGS for ancestor in node.iterancestors()
+    )
+
+
+def _to_html(node: HtmlElement) -> str:
+    """Serialize an element (without its tail text) as HTML."""
+    return etree.tostring(node, method="html", encoding="unicode", with_tail=False)
+
+
+def _visible_text_length(node: HtmlElement) -> int:
+    """len() of BeautifulSoup's `get_text(strip=True)` for the element."""
+    return sum(len(part.strip()) for part in visible_strings(node))
+
+
+def _escape_text(text: str) -> str:
+    """Escape text the way the HTML serializer does for element content."""
+    shell = etree.Element("p")
+    shell.text = text
+    return _to_html(shell)[3:-4]
+
+
+def _iter_html(node: HtmlElement) -> Iterator[str]:
+    """Yield the markup of `node` piece by piece; the pieces join to `_to_html(node)`"""
+    if not isinstance(node.tag, str) or len(node) == 0:
+        yield _to_html(node)
+        return
+    shell = etree.Element(node.tag, dict(node.attrib))
+    shell.text = node.text
+    shell = _to_html(shell)
+    split_at = shell.rfind("</")
+    if split_at < 0:
+        yield _to_html(node)
+        return
+    yield shell[:split_at]
+    for child in node:
+        yield from _iter_html(child)
+        if child.tail:
+            yield _escape_text(child.tail)
+    yield shell[split_at:]
+
+
+def _join_capped(pieces: Iterable[str], max_length: int) -> str:
+    """Join pieces, stopping once past max_length (truncated with "...")"""
+    parts = []
+    length = 0
+    for piece in pieces:
+        parts.append(piece)
+        length += len(piece)
+        if length > max_length:
+            return "".join(parts)[:max_length] + "..."
+    return "".join(parts)
+
+
+def clean_html_for_llm(html: str, max_length: int = 8000, tree: Optional[HtmlElement] = None) -> str:
     """
     Clean and prepare HTML for LLM processing.
     Keep structure but remove unnecessary elements.
+    Pass an already parsed `tree` to skip parsing; it is copied before
+    cleaning, so the shared tree stays intact.
     """
-    soup = BeautifulSoup(html, "html.parser")
+    tree = parse_html(html) if tree is None else copy.deepcopy(tree)
+    _collapse_blank_strings(tree)
     
     # Remove scripts, styles, and navigation elements
-    for element in soup(["script", "style", "nav", "header", "footer", "aside", "noscript"]):
-        element.decompose()
+    etree.strip_elements(tree, *_HTML_DROP_TAGS, with_tail=False)
     
     # Remove common non-content elements
-    for selector in [
-        '[class*="cookie" i]', '[id*="cookie" i]',
-        '[class*="gdpr" i]', '[id*="gdpr" i]',
-        '[class*="advertisement" i]', '[id*="advertisement" i]',
-        '[class*="banner" i]', '[id*="banner" i]',
-        '.social', '.share', '.newsletter'
-    ]:
-        for element in soup.select(selector):
-            element.decompose()
-    
-    # Focus on likely menu content areas
-    menu_selectors = [
-        '[class*="menu" i]', '[id*="menu" i]',
-        '[class*="jidlo" i]', '[id*="jidlo" i]',
-        '[class*="denni" i]', '[id*="denni" i]',
-        '[class*="poledni" i]', '[id*="poledni" i]',
-        'main', 'article', '.content', '#content'
-    ]
+    for element in _HTML_NOISE_XPATH(tree):
+        element.drop_tree()
     
     menu_containers = []
-    for selector in menu_selectors:
-        try:
-            containers = soup.select(selector)
-            menu_containers.extend(containers)
-        except Exception:
-            continue
+    for selector in _HTML_MENU_XPATHS:
+        menu_containers.extend(_top_level(selector(tree)))
     
     if menu_containers:
         # If we found menu-specific containers, use only those
-        clean_soup = BeautifulSoup("<html><body></body></html>", "html.parser")
-        body = clean_soup.find("body")
-        
-        for container in menu_containers[:3]:  # Limit to first 3 containers
-            body.append(container.extract())
-        
-        html_content = str(clean_soup)
+        containers = menu_containers[:3]  # Limit to first 3 containers
+        # Detach all of them first, so a container nested in another is
+        # only serialized once
+        for container in containers:
+            if container.getparent() is not None:
+                container.drop_tree()
+        pieces = itertools.chain(
+            ["<html><body>"],
+            itertools.chain.from_iterable(_iter_html(c) for c in containers),
+            ["</body></html>"]
+        )
     else:
         # Fallback to cleaned full HTML
-        html_content = str(soup)
-    
-    # Truncate if too long
-    if len(html_content) > max_length:
-        html_content = html_content[:max_length] + "..."
+        pieces = _iter_html(tree)
     
-    return html_content
+    # Serialize only up to max_length, truncating if too long
+    return _join_capped(pieces, max_length)
 
 
-def clean_body_text_for_llm(html: str, max_length: int = 8000) -> str:
+def clean_body_text_for_llm(html: str, max_length: int = 8000, tree: Optional[HtmlElement] = None) -> str:
     """
     Extract only the inner contents of <body>, remove non-content tags, and
     return a compact text suitable for LLM input.
@@ -80,43 +234,32 @@ def clean_body_text_for_llm(html: str, max_length: int = 8000) -> str:
     - Drop common cookie/GDPR/ads/banner elements by class/id heuristics
     - Convert remaining content to text with sensible newlines
     - Truncate to max_length to keep prompt small enough
+
+    Pass an already parsed `tree` to skip parsing; its body is copied
+    before the noise tags are stripped, so the shared tree stays intact.
     """
-    soup = BeautifulSoup(html, "html.parser")
-
-    body = soup.body if soup.body else soup
-
-    # Tags to remove completely
-    drop_tags = [
-        "script", "style", "nav", "header", "footer", "aside", "noscript",
-        "svg", "canvas", "iframe", "link", "meta", "form", "picture",
-        "source", "video", "audio", "button", "input", "select", "textarea",
-        "dialog",
-    ]
-    for el in body.find_all(drop_tags):
-        el.decompose()
-
-    # Heuristics for cookie/GDPR/ads/social/newsletter/banners
-    noise_selectors = [
-        '[class*="cookie" i]', '[id*="cookie" i]',
-        '[class*="consent" i]', '[id*="consent" i]',
-        '[class*="gdpr" i]', '[id*="gdpr" i]',
-        '[class*="advert" i]', '[id*="advert" i]',
-        '[class*="banner" i]', '[id*="banner" i]',
-        '.social', '.share', '.newsletter', '.breadcrumbs', '.breadcrumb'
-    ]
-    for sel in noise_selectors:
-        for el in body.select(sel):
-            el.decompose()
+    if tree is None:
+        body = body_or_root(parse_html(html))
+    else:
+        body = copy.deepcopy(body_or_root(tree))
+    return _clean_body_from_tree(body, max_length)
+
+
+def _clean_body_from_tree(body: HtmlElement, max_length: int) -> str:
+    """clean_body_text_for_llm() on a body element it may modify."""
+    etree.strip_elements(body, *_BODY_DROP_TAGS, with_tail=False)
+
+    for el in _BODY_NOISE_XPATH(body):
+        el.drop_tree()
 
     # Convert to text, preserving some structure with newlines
-    text = body.get_text("\n", strip=True)
+    text = get_text(body, "\n")
 
     # Normalize whitespace and collapse excessive empty lines
-    import re
     # Replace 3+ newlines with 2
-    text = re.sub(r"\n{3,}", "\n\n", text)
+    text = _MULTI_NEWLINE_RE.sub("\n\n", text)
     # Trim overly long whitespace sequences
-    text = re.sub(r"[ \t]{2,}", " ", text)
+    text = _MULTI_SPACE_RE.sub(" ", text)
 
     # Truncate if too long
     if len(text) > max_length:
@@ -125,12 +268,40 @@ def clean_body_text_for_llm(html: str, max_length: int = 8000) -> str:
     return text
 
 
-def extract_date_info_from_html(html: str) -> Dict[str, Any]:
+def parse_and_extract(html: str, max_length: int = 8000) -> Tuple[str, str]:
+    """
+    Parse the page once and return (extract_menu_text, clean_body_text_for_llm)
+    results for it.
+    """
+    tree = parse_html(html)
+    # Both extractors discard these subtrees, so drop them before the copy
+    etree.strip_elements(tree, *_SHARED_DROP_TAGS, with_tail=False)
+    # Copying the body is cheaper than parsing the page a second time
+    cleaned_body = _clean_body_from_tree(copy.deepcopy(body_or_root(tree)), max_length)
+    return menu_text_from_tree(tree), cleaned_body
+
+
+def _find_dates(text: str) -> List[str]:
+    """Same result as running findall for each of _DATE_PATTERNS in turn, in one scan"""
+    found = [[] for _ in _DATE_PATTERNS]
+    resume_at = [0] * len(_DATE_PATTERNS)
+    for match in _ALL_DATES_RE.finditer(text):
+        for i, value in enumerate(match.groups()):
+            # findall never returns a match overlapping the previous one
+            if value is not None and match.start() >= resume_at[i]:
+                found[i].append(value)
+                resume_at[i] = match.start() + len(value)
+    return [value for matches in found for value in matches]
+
+
+def extract_date_info_from_html(html: str, tree: Optional[HtmlElement] = None) -> Dict[str, Any]:
     """
     Extract date-related information from HTML structure.
     Look for date patterns in text, attributes, and meta tags.
+    Pass an already parsed `tree` to skip parsing.
     """
-    soup = BeautifulSoup(html, "html.parser")
+    if tree is None:
+        tree = parse_html(html)
     date_info = {
         "found_dates": [],
         "found_weekdays": [],
@@ -138,52 +309,28 @@ def extract_date_info_from_html(html: str) -> Dict[str, Any]:
     }
     
     # Look for date patterns in text
-    date_patterns = [
-        r'\d{1,2}\.\d{1,2}\.\d{4}',  # DD.MM.YYYY
-        r'\d{1,2}\.\d{1,2}\.?',      # DD.MM.
-        r'\d{4}-\d{2}-\d{2}',        # YYYY-MM-DD
-        r'\d{1,2}/\d{1,2}/\d{4}',    # DD/MM/YYYY
-    ]
-    
-    all_text = soup.get_text()
-    for pattern in date_patterns:
-        matches = re.findall(pattern, all_text)
-        date_info["found_dates"].extend(matches)
-    
-    # Look for Czech weekdays
-    text_lower = all_text.lower()
-    for weekday in CZ_WEEKDAYS:
-        if weekday in text_lower:
-            date_info["found_weekdays"].append(weekday)
-    
-    # Look for menu type indicators
-    menu_indicators = [
-        "denní menu", "daily menu", "menu dne", "dnes",
-        "polední menu", "lunch menu", "týdenní menu",
-        "jídelní lístek", "menu na"
-    ]
+    page_text = all_text(tree)
+    date_info["found_dates"].extend(_find_dates(page_text))
     
-    for indicator in menu_indicators:
-        if indicator.lower() in text_lower:
-            date_info["menu_type_indicators"].append(indicator)
+    # Look for Czech weekdays and menu type indicators (plain substring
+    # checks on one lowercased copy beat a keyword regex over the whole text)
+    page_lower = page_text.lower()
+    date_info["found_weekdays"] = [w for w in CZ_WEEKDAYS if w in page_lower]
+    date_info["menu_type_indicators"] = [i for i in _MENU_INDICATORS if i in page_lower]
     
     # Look for time-related meta tags or structured data
-    meta_tags = soup.find_all("meta")
-    for meta in meta_tags:
+    for meta in tree.iter("meta"):
         content = meta.get("content", "")
-        if any(word in content.lower() for word in ["date", "updated", "modified"]):
-            date_info["meta_dates"] = date_info.get("meta_dates", [])
-            date_info["meta_dates"].append(content)
+        content_lower = content.lower()
+        if any(word in content_lower for word in _META_DATE_WORDS):
+            date_info.setdefault("meta_dates", []).append(content)
     
     # Look for datetime attributes in time tags
-    time_tags = soup.find_all("time")
-    for time_tag in time_tags:
+    for time_tag in tree.iter("time"):
         datetime_attr = time_tag.get("datetime", "")
         if datetime_attr:
             # Extract date from datetime attribute
-            for pattern in date_patterns:
-                matches = re.findall(pattern, datetime_attr)
-                date_info["found_dates"].extend(matches)
+            date_info["found_dates"].extend(_find_dates(datetime_attr))
     
     return date_info
 
@@ -193,38 +340,19 @@ def get_menu_focused_html(html: str) -> str:
     Extract HTML focused specifically on menu content.
     This is an alternative to text extraction for LLM processing.
     """
-    soup = BeautifulSoup(html, "html.parser")
-    
-    # Priority selectors for menu content
-    menu_selectors = [
-        # High priority - specific menu terms
-        '[class*="menu" i]', '[id*="menu" i]',
-        '[class*="jidelni" i]', '[id*="jidelni" i]',
-        '[class*="denni" i]', '[id*="denni" i]',
-        '[class*="poledni" i]', '[id*="poledni" i]',
-        '[class*="daily" i]', '[id*="daily" i]',
-        
-        # Medium priority - content areas
-        'main', 'article', 'section[class*="content" i]',
-        '.content', '#content', '.main-content',
-        
-        # Lower priority - general containers
-        '.container', '.wrapper'
-    ]
+    tree = parse_html(html)
+    _collapse_blank_strings(tree)
     
     menu_html_parts = []
     
-    for selector in menu_selectors:
-        elements = soup.select(selector)
-        for element in elements:
+    for selector in _FOCUSED_MENU_XPATHS:
+        for element in _top_level(selector(tree)):
             # Check if element has substantial content
-            text = element.get_text(strip=True)
-            if len(text) > 50:  # Minimum content threshold
+            if _visible_text_length(element) > 50:  # Minimum content threshold
                 # Clean the element
-                for unwanted in element.select("script, style, nav, footer"):
-                    unwanted.decompose()
+                etree.strip_elements(element, *_FOCUSED_DROP_TAGS, with_tail=False)
                 
-                menu_html_parts.append(str(element))
+                menu_html_parts.append(_to_html(element))
         
         # If we found good menu content, stop looking
         if menu_html_parts and sum(len(part) for part in menu_html_parts) > 500:
@@ -232,9 +360,8 @@ def get_menu_focused_html(html: str) -> str:
     
     if not menu_html_parts:
         # Fallback: return cleaned version of full page
-        for unwanted in soup.select("script, style, nav, header, footer, aside"):
-            unwanted.decompose()
-        return str(soup)
+        etree.strip_elements(tree, *_FOCUSED_FALLBACK_DROP_TAGS, with_tail=False)
+        return _to_html(tree)
     
     # Combine found menu parts into clean HTML structure
     result_html = f"""
@@ -248,7 +375,11 @@ def get_menu_focused_html(html: str) -> str:
     return result_html
 
 
-def should_use_html_mode(html: str) -> bool:
+def _has_price_token(low: str) -> bool:
+    return "kč" in low or "czk" in low or ",-" in low
+
+
+def should_use_html_mode(html: str, tree: Optional[HtmlElement] = None) -> bool:
     """
     Determine if we should send HTML directly to LLM or use text extraction.
     
@@ -256,19 +387,33 @@ def should_use_html_mode(html: str) -> bool:
     - Page has complex structure (tables, lists)
     - Menu items are in structured format
     - Text extraction loses important formatting
+
+    Without a `tree` the markup is scanned with regexes instead of being
+    parsed; pass an already parsed `tree` to check the DOM precisely.
     """
-    soup = BeautifulSoup(html, "html.parser")
+    if tree is None:
+        # Each regex only runs once a substring it needs is present
+        low = html.lower()
+        lists = _LIST_TAG_RE.finditer(html)
+        return bool(
+            ("<table" in low and _TABLE_TAG_RE.search(html))
+            or (("<ul" in low or "<ol" in low)
+                and next(lists, None) is not None and next(lists, None) is not None)
+            or ("menu" in low and _MENU_ATTR_RE.search(html))
+            or (_has_price_token(low) and _PRICE_RE.search(html))
+        )
     
     # Check for structured content indicators
-    has_tables = len(soup.find_all("table")) > 0
-    has_lists = len(soup.find_all(["ul", "ol"])) > 1
-    has_menu_structure = len(soup.select('[class*="menu" i], [id*="menu" i]')) > 0
+    has_tables = tree.find(".//table") is not None
+    has_lists = len(tree.xpath("//ul | //ol")) > 1
+    has_menu_structure = len(tree.xpath(
+        f"//*[{attr_contains_ci('class', 'menu')} or {attr_contains_ci('id', 'menu')}]"
+    )) > 0
     
     # Check for price indicators in structured format
     price_in_structure = False
-    for element in soup.select("td, li, .price, [class*='price' i]"):
-        text = element.get_text()
-        if re.search(r'\d+[.,]?-?\s*(?:kč|czk|,-)', text.lower()):
+    for element in tree.xpath(f"//td | //li | //*[{has_class('price')} or {attr_contains_ci('class', 'price')}]"):
+        if _PRICE_RE.search(element.text_content()):
             price_in_structure = True
             break
     
@@ -0,0 +1,43 @@
+"""
+Shared httpx client for the fetch modules.
+One connection pool per event loop, so keep-alive connections and TLS
+sessions are reused across requests instead of handshaking every time.
+"""
+
+import asyncio
+import importlib.util
+from typing import Optional
+
+import httpx
+
+# HTTP/2 needs the optional h2 package (pip install httpx[http2])
+_HTTP2 = importlib.util.find_spec("h2") is not None
+
+# httpx can only decode Brotli bodies when brotli (or brotlicffi) is
+# installed, so only advertise br when a server's answer can be read
+_BROTLI = any(importlib.util.find_spec(name) is not None for name in ("brotli", "brotlicffi"))
+ACCEPT_ENCODING = "gzip, deflate, br" if _BROTLI else "gzip, deflate"
+
+_LIMITS = httpx.Limits(max_connections=100, max_keepalive_connections=50, keepalive_expiry=15)
+
+_client: Optional[httpx.AsyncClient] = None
+_client_loop: Optional[asyncio.AbstractEventLoop] = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """Return the shared client, creating it on first use in the running loop."""
+    global _client, _client_loop
+    loop = asyncio.get_running_loop()
+    if _client is None or _client.is_closed or _client_loop is not loop:
+        # Pooled connections are bound to the loop that opened them
+        _client = httpx.AsyncClient(http2=_HTTP2, limits=_LIMITS, follow_redirects=True)
+        _client_loop = loop
+    return _client
+
+
+async def close_client():
+    """Close the shared client (on shutdown)."""
+    global _client, _client_loop
+    if _client is not None and _client_loop is asyncio.get_running_loop():
+        await _client.aclose()
+    _client, _client_loop = None, None
@@ -1,12 +1,255 @@
 import asyncio
+import re
 from playwright.async_api import async_playwright, TimeoutError as PlaywrightTimeout
-from bs4 import BeautifulSoup
-from typing import Optional
+from lxml import etree
+from typing import Optional, Dict, Any
 from app.core.config import settings
+from app.fetch.dom import parse_html, select, get_text
+
+_BROWSER_ARGS = [
+    '--no-sandbox',
+    '--disable-dev-shm-usage',
+    '--disable-gpu',
+    '--disable-features=VizDisplayCompositor'
+]
+
+# Subresources that never affect the extracted text; class attributes
+# used by the analyzers live in the HTML itself, so CSS can go too
+_BLOCKED_RESOURCE_TYPES = frozenset({"image", "font", "media", "stylesheet"})
+
+# Common cookie banner buttons to dismiss before reading content
+_COOKIE_BUTTON_SELECTORS = (
+    'button:has-text("Accept")',
+    'button:has-text("I Agree")',
+    'button:has-text("Souhlasím")',
+    'button:has-text("Přijmout")',
+    '[id*="cookie" i] button',
+    '[class*="cookie" i] button'
+)
+
+# Relevant content selectors tried progressively while waiting for render
+_CONTENT_WAIT_SELECTORS = (
+    '[class*="menu" i], [id*="menu" i]',
+    'main [class*="menu" i]',
+    '#__next',
+    'script#__NEXT_DATA__',
+    'main',
+    'article',
+    'section'
+)
+
+_DROP_TAGS = ("script", "style", "nav", "header", "footer", "aside")
+
+# extract_menu_text_js: menu-specific selectors in order of priority, each
+# group combined into one query so the tree is walked once per group
+_MENU_SELECTOR_GROUPS = tuple(", ".join(group) for group in (
+    (
+        # Direct menu selectors
+        '[class*="menu" i]', '[id*="menu" i]',
+        '[class*="food" i]', '[id*="food" i]',
+        '[class*="dish" i]', '[id*="dish" i]',
+        '[class*="item" i]', '[id*="item" i]',
+        '[class*="product" i]', '[id*="product" i]',
+
+        # Czech menu terms
+        '[class*="jidlo" i]', '[id*="jidlo" i]',
+        '[class*="jidelni" i]', '[id*="jidelni" i]',
+        '[class*="listek" i]', '[id*="listek" i]',
+        '[class*="dnes" i]', '[id*="dnes" i]',
+        '[class*="denni" i]', '[id*="denni" i]',
+        '[class*="poledni" i]', '[id*="poledni" i]',
+
+        # English menu terms
+        '[class*="daily" i]', '[id*="daily" i]',
+        '[class*="lunch" i]', '[id*="lunch" i]',
+        '[class*="restaurant" i]', '[id*="restaurant" i]',
+
+        # Restaurant-specific selectors
+        '[class*="roll" i]', '[id*="roll" i]',  # For sushi
+        '[class*="sushi" i]', '[id*="sushi" i]',
+        '[class*="pizza" i]', '[id*="pizza" i]',
+        '[class*="pasta" i]', '[id*="pasta" i]',
+    ),
+    (
+        # Common content containers
+        '.content', '.main', '.main-content',
+        '#content', '#main', '#main-content',
+        '.container', '.wrapper', '.page-content',
+        'article', 'section', 'main',
+    ),
+))
+
+_PRICE_MARKERS = ('kč', 'czk', ',-', '$', '€', 'price')
+_BOILERPLATE_PREFIXES = ('cookie', 'gdpr', 'consent', 'terms', 'privacy')
+_WHITESPACE_RE = re.compile(r'\s+')
+# Any letter: a word character that is neither a digit nor "_"
+_HAS_LETTER_RE = re.compile(r'[^\W\d_]')
+
+# Shared Chromium instance, launched lazily on first use and relaunched
+# after BROWSER_POOL_RECYCLE_AFTER contexts to avoid state drift
+_playwright = None
+_browser = None
+_browser_uses = 0
+_active_contexts: Dict[Any, int] = {}
+_browser_lock = asyncio.Lock()
+
+# Pool of JS_CONTEXT_POOL_SIZE reusable BrowserContexts; the queue holds
+# idle contexts and None for slots whose context is created on checkout,
+# so it also bounds how many pages render at once
+_context_pool: Optional[asyncio.Queue] = None
+_context_browser: Dict[Any, Any] = {}
+_context_uses: Dict[Any, int] = {}
+
+async def _acquire_browser():
+    """Return the shared browser, launching or recycling it when needed"""
+    global _playwright, _browser, _browser_uses
+    async with _browser_lock:
+        if _browser is not None and (
+            _browser_uses >= settings.BROWSER_POOL_RECYCLE_AFTER or not _browser.is_connected()
+        ):
+            retired, _browser = _browser, None
+            # In-flight fetches keep the old browser until they release it
+            if not _active_contexts.get(retired):
+                _active_contexts.pop(retired, None)
+                await retired.close()
+
+        if _browser is None:
+            if _playwright is None:
+                _playwright = await async_playwright().start()
+            _browser = await _playwright.chromium.launch(
+                headless=settings.PLAYWRIGHT_HEADLESS,
+                args=_BROWSER_ARGS
+            )
+            _browser_uses = 0
+
+        _browser_uses += 1
+        _active_contexts[_browser] = _active_contexts.get(_browser, 0) + 1
+        return _browser
+
+async def _release_browser(browser):
+    """Release a browser handed out by _acquire_browser, closing it if retired"""
+    async with _browser_lock:
+        _active_contexts[browser] -= 1
+        if browser is not _browser and not _active_contexts[browser]:
+            del _active_contexts[browser]
+            await browser.close()
+
+def _get_context_pool() -> asyncio.Queue:
+    global _context_pool
+    if _context_pool is None:
+        _context_pool = asyncio.Queue()
+        for _ in range(settings.JS_CONTEXT_POOL_SIZE):
+            _context_pool.put_nowait(None)
+    return _context_pool
+
+async def _new_context():
+    """Create a pooled context on the shared browser"""
+    browser = await _acquire_browser()
+    try:
+        context = await browser.new_context(
+            user_agent=settings.USER_AGENT,
+            extra_http_headers={"Accept-Encoding": "gzip, br"}
+        )
+        await context.route("**/*", _block_heavy_resources)
+    except BaseException:
+        await _release_browser(browser)
+        raise
+    _context_browser[context] = browser
+    _context_uses[context] = 0
+    return context
+
+async def _discard_context(context):
+    """Close a pooled context and release its browser"""
+    browser = _context_browser.pop(context)
+    _context_uses.pop(context, None)
+    try:
+        await context.close()
+    except Exception:
+        pass
+    await _release_browser(browser)
+
+async def _checkout_context():
+    """Wait for a free pool slot and return a ready context"""
+    pool = _get_context_pool()
+    context = await pool.get()
+    try:
+        # Contexts on a retired or crashed browser are replaced
+        if context is not None:
+            browser = _context_browser[context]
+            if browser is not _browser or not browser.is_connected():
+                await _discard_context(context)
+                context = None
+        if context is None:
+            context = await _new_context()
+    except BaseException:
+        pool.put_nowait(None)
+        raise
+    return context
+
+async def _return_context(context):
+    """Give a context back to the pool, recycling it after JS_CONTEXT_RECYCLE_AFTER pages"""
+    if context not in _context_browser:
+        # The pool was torn down by close_browser() while this page rendered
+        return
+    pool = _get_context_pool()
+    _context_uses[context] += 1
+    try:
+        if _context_uses[context] >= settings.JS_CONTEXT_RECYCLE_AFTER:
+            await _discard_context(context)
+            context = None
+        else:
+            # Don't carry one site's cookies over to the next
+            await context.clear_cookies()
+    except Exception:
+        if context in _context_browser:
+            await _discard_context(context)
+        context = None
+    finally:
+        pool.put_nowait(context)
+
+def context_pool_stats() -> Dict[str, int]:
+    """In-use and idle counts of the JS context pool"""
+    size = settings.JS_CONTEXT_POOL_SIZE
+    free = _context_pool.qsize() if _context_pool is not None else size
+    in_use = size - free
+    return {
+        "size": size,
+        "in_use": in_use,
+        "idle": len(_context_browser) - in_use,
+        "free_slots": free,
+    }
+
+async def close_browser():
+    """Close the shared browser and stop Playwright (application shutdown)"""
+    global _playwright, _browser, _browser_uses, _context_pool
+    async with _browser_lock:
+        _context_pool = None
+        _context_browser.clear()
+        _context_uses.clear()
+        browsers = {*_active_contexts, _browser} - {None}
+        for browser in browsers:
+            try:
+                await browser.close()
+            except Exception:
+                pass
+        _active_contexts.clear()
+        _browser, _browser_uses = None, 0
+        if _playwright is not None:
+            await _playwright.stop()
+            _playwright = None
+
+async def _block_heavy_resources(route):
+    """Abort images/fonts/media/stylesheets so networkidle fires sooner"""
+    if route.request.resource_type in _BLOCKED_RESOURCE_TYPES:
+        await route.abort()
+    else:
+        await route.continue_()
 
 async def fetch_js_html(url: str, wait_for_content: bool = True) -> str:
     """
     Fetch HTML from a URL using Playwright to handle JavaScript.
+    Each call checks a BrowserContext out of the shared pool and opens
+    a fresh page in it; calls wait while all contexts are busy.
     
     Args:
         url: The URL to fetch
@@ -16,23 +259,10 @@ async def fetch_js_html(url: str, wait_for_content: bool = True) -> str:
         Raw HTML string after JavaScript execution
     """
     try:
-        async with async_playwright() as p:
-            # Launch browser (headless configurable)
-            browser = await p.chromium.launch(
-                headless=settings.PLAYWRIGHT_HEADLESS,
-                args=[
-                    '--no-sandbox',
-                    '--disable-dev-shm-usage',
-                    '--disable-gpu',
-                    '--disable-features=VizDisplayCompositor'
-                ]
-            )
-            
-            # Create a new page
-            page = await browser.new_page()
-            
-            # Set user agent
-            await page.set_extra_http_headers({"User-Agent": settings.USER_AGENT})
+        context = await _checkout_context()
+        page = None
+        try:
+            page = await context.new_page()
             
             # Navigate to the URL with timeout (first ensure DOM content loaded)
             await page.goto(url, timeout=settings.REQUEST_TIMEOUT * 1000, wait_until="domcontentloaded")
@@ -43,15 +273,7 @@ async def fetch_js_html(url: str, wait_for_content: bool = True) -> str:
                 pass
 
             # Try dismissing common cookie banners to unblock content
-            cookie_selectors = [
-                'button:has-text("Accept")',
-                'button:has-text("I Agree")',
-                'button:has-text("Souhlasím")',
-                'button:has-text("Přijmout")',
-                '[id*="cookie" i] button',
-                '[class*="cookie" i] button'
-            ]
-            for sel in cookie_selectors:
+            for sel in _COOKIE_BUTTON_SELECTORS:
                 try:
                     btn = page.locator(sel).first
                     if await btn.count() > 0:
@@ -63,17 +285,8 @@ async def fetch_js_html(url: str, wait_for_content: bool = True) -> str:
             # Wait for content to load if requested
             if wait_for_content:
                 # Try multiple relevant selectors progressively
-                selectors = [
-                    '[class*="menu" i], [id*="menu" i]',
-                    'main [class*="menu" i]',
-                    '#__next',
-                    'script#__NEXT_DATA__',
-                    'main',
-                    'article',
-                    'section'
-                ]
                 waited = False
-                for sel in selectors:
+                for sel in _CONTENT_WAIT_SELECTORS:
                     try:
                         await page.wait_for_selector(sel, timeout=min(4000, settings.JS_WAIT_TIMEOUT_MS))
                         waited = True
@@ -93,10 +306,14 @@ async def fetch_js_html(url: str, wait_for_content: bool = True) -> str:
                 await page.wait_for_timeout(min(3000, settings.JS_EXTRA_WAIT_MS))
             
             # Get the rendered HTML
-            html = await page.content()
-            
-            await browser.close()
-            return html
+            return await page.content()
+        finally:
+            if page is not None:
+                try:
+                    await page.close()
+                except Exception:
+                    pass
+            await _return_context(context)
             
     except PlaywrightTimeout:
         raise Exception(f"Timeout while fetching {url}")
@@ -108,61 +325,26 @@ def extract_menu_text_js(html: str) -> str:
     Extract menu text from JavaScript-rendered HTML.
     Enhanced version with better menu detection.
     """
-    soup = BeautifulSoup(html, "html.parser")
+    tree = parse_html(html)
     
     # Remove script and style elements
-    for script in soup(["script", "style", "nav", "header", "footer", "aside"]):
-        script.decompose()
+    etree.strip_elements(tree, *_DROP_TAGS, with_tail=False)
     
     menu_text = []
     
-    # Enhanced menu-specific selectors in order of priority
-    menu_selectors = [
-        # Direct menu selectors
-        '[class*="menu" i]', '[id*="menu" i]',
-        '[class*="food" i]', '[id*="food" i]',
-        '[class*="dish" i]', '[id*="dish" i]',
-        '[class*="item" i]', '[id*="item" i]',
-        '[class*="product" i]', '[id*="product" i]',
-        
-        # Czech menu terms
-        '[class*="jidlo" i]', '[id*="jidlo" i]', 
-        '[class*="jidelni" i]', '[id*="jidelni" i]',
-        '[class*="listek" i]', '[id*="listek" i]',
-        '[class*="dnes" i]', '[id*="dnes" i]',
-        '[class*="denni" i]', '[id*="denni" i]',
-        '[class*="poledni" i]', '[id*="poledni" i]',
-        
-        # English menu terms  
-        '[class*="daily" i]', '[id*="daily" i]',
-        '[class*="lunch" i]', '[id*="lunch" i]',
-        '[class*="restaurant" i]', '[id*="restaurant" i]',
-        
-        # Restaurant-specific selectors
-        '[class*="roll" i]', '[id*="roll" i]',  # For sushi
-        '[class*="sushi" i]', '[id*="sushi" i]',
-        '[class*="pizza" i]', '[id*="pizza" i]',
-        '[class*="pasta" i]', '[id*="pasta" i]',
-        
-        # Common content containers
-        '.content', '.main', '.main-content', 
-        '#content', '#main', '#main-content',
-        '.container', '.wrapper', '.page-content',
-        'article', 'section', 'main'
-    ]
-    
     # Try to find menu-specific elements first
     found_menu_content = False
-    for selector in menu_selectors:
-        try:
-            elements = soup.select(selector)
-            for element in elements:
-                text = element.get_text(" ", strip=True)
-                if text and len(text) > 20:  # Meaningful content threshold
-                    menu_text.append(text)
-                    found_menu_content = True
-        except Exception:
-            continue
+    for selector in _MENU_SELECTOR_GROUPS:
+        outer = None
+        for element in select(tree, selector):
+            # Matches come in document order; skip ones nested in a collected element
+            if outer is not None and outer in element.iterancestors():
+                continue
+            text = get_text(element, " ")
+            if text and len(text) > 20:  # Meaningful content threshold
+                menu_text.append(text)
+                found_menu_content = True
+                outer = element
         
         # If we found good menu content, prioritize it
         if found_menu_content and len(" ".join(menu_text)) > 200:
@@ -171,42 +353,28 @@ def extract_menu_text_js(html: str) -> str:
     # If no menu-specific content found, use comprehensive extraction
     if not menu_text or len(" ".join(menu_text)) < 100:
         # Look for price indicators which suggest menu content
-        price_patterns = ['kč', 'czk', ',-', '$', '€', 'price']
-        
-        for tag in soup.find_all(["div", "section", "article", "ul", "ol", "table"]):
-            text = tag.get_text(" ", strip=True)
-            if (text and 
-                len(text) > 30 and 
-                len(text) < 1000 and  # Not too long
-                any(pattern in text.lower() for pattern in price_patterns)):
+        for tag in tree.iter("div", "section", "article", "ul", "ol", "table"):
+            text = get_text(tag, " ")
+            if not (30 < len(text) < 1000):  # Not too short or too long
+                continue
+            text_lower = text.lower()
+            if any(pattern in text_lower for pattern in _PRICE_MARKERS):
                 menu_text.append(text)
         
         # If still no good content, get all meaningful text
         if not menu_text:
-            for tag in soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6", "p", "li", "td", "span", "div"]):
-                text = tag.get_text(" ", strip=True)
+            for tag in tree.iter("h1", "h2", "h3", "h4", "h5", "h6", "p", "li", "td", "span", "div"):
+                text = get_text(tag, " ")
                 if (text and 
                     len(text) > 15 and 
                     len(text) < 500 and
-                    not text.lower().startswith(('cookie', 'gdpr', 'consent', 'terms', 'privacy')) and
-                    any(char.isalpha() for char in text)):
+                    not text.lower().startswith(_BOILERPLATE_PREFIXES) and
+                    _HAS_LETTER_RE.search(text)):
                     menu_text.append(text)
     
-    # Join and clean the text
-    full_text = "\n".join(menu_text)
-    
-    # Additional text cleaning
-    import re
-    # Remove excessive whitespace
-    full_text = re.sub(r'\s+', ' ', full_text)
+    # Remove excessive whitespace within each block, keeping one block per line
+    lines = (_WHITESPACE_RE.sub(' ', text).strip() for text in menu_text)
     # Remove repeated phrases (common in navigation)
-    lines = full_text.split('\n')
-    unique_lines = []
-    seen = set()
-    for line in lines:
-        line = line.strip()
-        if line and line not in seen and len(line) > 5:
-            unique_lines.append(line)
-            seen.add(line)
+    unique_lines = [line for line in dict.fromkeys(lines) if len(line) > 5]
     
     return "\n".join(unique_lines)
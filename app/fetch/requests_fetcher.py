@@ -1,10 +1,11 @@
 import datetime as dt
 import re
 from typing import Optional
-import requests
-from bs4 import BeautifulSoup
+from lxml import etree
 
-from .base import BaseFetcher, FetchResult
+from .base import AsyncBaseFetcher, FetchResult
+from .dom import parse_html, visible_strings
+from .http_client import get_client
 
 _USER_AGENT = (
     "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
@@ -12,22 +13,26 @@ _USER_AGENT = (
     "Chrome/127.0.0.0 Safari/537.36"
 )
 
-class RequestsFetcher(BaseFetcher):
-    def fetch(self, url: str, timeout_sec: int = 15) -> FetchResult:
+# nbsp and horizontal whitespace become plain spaces, then runs collapse to one
+_HSPACE_TRANS = str.maketrans(dict.fromkeys("\u00a0\t\x0b\x0c\r", " "))
+_MULTI_SPACE_RE = re.compile(r" {2,}")
+_BLANK_LINES_RE = re.compile(r"\n\s*\n+")
+
+class RequestsFetcher(AsyncBaseFetcher):
+    async def fetch(self, url: str, timeout_sec: int = 15) -> FetchResult:
         headers = {"User-Agent": _USER_AGENT, "Accept-Language": "cs,en;q=0.8"}
-        resp = requests.get(url, headers=headers, timeout=timeout_sec)
+        resp = await get_client().get(url, headers=headers, timeout=timeout_sec)
         final_url = str(resp.url)
         status = int(resp.status_code)
 
         html: Optional[str] = None
         text: Optional[str] = None
 
-        if resp.ok and resp.text:
+        if resp.status_code < 400 and resp.text:
             html = resp.text
-            soup = BeautifulSoup(html, "html.parser")
-            for tag in soup(["script", "style", "noscript"]):
-                tag.decompose()
-            raw_text = soup.get_text("\n")
+            tree = parse_html(html)
+            etree.strip_elements(tree, "script", "style", "noscript", with_tail=False)
+            raw_text = "\n".join(visible_strings(tree))
             text = _normalize_text(raw_text)
 
         return FetchResult(
@@ -40,7 +45,6 @@ class RequestsFetcher(BaseFetcher):
         )
 
 def _normalize_text(s: str) -> str:
-    s = re.sub(r"\u00a0", " ", s)          
-    s = re.sub(r"[ \t\x0b\x0c\r]+", " ", s)
-    s = re.sub(r"\n\s*\n+", "\n\n", s)     
+    s = _MULTI_SPACE_RE.sub(" ", s.translate(_HSPACE_TRANS))
+    s = _BLANK_LINES_RE.sub("\n\n", s)
     return s.strip()
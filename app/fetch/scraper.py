@@ -1,30 +1,98 @@
 import httpx
 import asyncio
-from bs4 import BeautifulSoup
-from typing import Optional
+import logging
+import re
+from hashlib import blake2b
+from lxml import etree
+from lxml import html as lxml_html
+from typing import Optional, Dict
 from app.core.config import settings
+from app.fetch.dom import parse_html, select, get_text
+from app.fetch.http_client import get_client, ACCEPT_ENCODING
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_HEADERS = {
+    "User-Agent": settings.USER_AGENT,
+    "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
+    "Accept-Language": "cs,en-US;q=0.7,en;q=0.3",
+    "Accept-Encoding": ACCEPT_ENCODING,
+    "DNT": "1",
+    "Connection": "keep-alive",
+    "Upgrade-Insecure-Requests": "1",
+}
+
+_WHITESPACE_RE = re.compile(r'\s+')
+_PRICE_NUMBER_RE = re.compile(r'(\d+)(?:[,.-]\d*)?')
+
+# extract_menu_text: menu-specific selectors in order of priority, each
+# group combined into one query so the tree is walked once per group
+_MENU_SELECTOR_GROUPS = tuple(", ".join(group) for group in (
+    (
+        # Czech menu terms
+        "[id*='menu' i]", "[class*='menu' i]",
+        "[id*='jidlo' i]", "[class*='jidlo' i]",
+        "[id*='jidelni' i]", "[class*='jidelni' i]",
+        "[id*='listek' i]", "[class*='listek' i]",
+        "[id*='dnes' i]", "[class*='dnes' i]",
+        "[id*='denni' i]", "[class*='denni' i]",
+        "[id*='poledni' i]", "[class*='poledni' i]",
+        "[id*='dnesni' i]", "[class*='dnesni' i]",
+
+        # English menu terms
+        "[id*='daily' i]", "[class*='daily' i]",
+        "[id*='lunch' i]", "[class*='lunch' i]",
+        "[id*='food' i]", "[class*='food' i]",
+        "[id*='dish' i]", "[class*='dish' i]",
+    ),
+    (
+        # Common menu container patterns
+        ".content", ".main", ".main-content",
+        "#content", "#main", "#main-content",
+        ".container", ".wrapper", ".page-content",
+    ),
+))
+
+_DROP_TAGS = ("script", "style", "nav", "header", "footer")
+_PRIORITY_TAGS = ("main", "article", "section")
+_FALLBACK_TAGS = ("h1", "h2", "h3", "h4", "h5", "h6", "p", "li", "td", "span", "div")
+_BOILERPLATE_PREFIXES = ("cookie", "gdpr", "consent", "terms", "privacy")
+# Any letter: a word character that is neither a digit nor "_"
+_HAS_LETTER_RE = re.compile(r'[^\W\d_]')
+# Lines at least this long are deduplicated by digest instead of by value
+_DIGEST_MIN_LENGTH = 64
+
+# Framework fingerprints of SPA/JS-heavy pages, one named group per framework
+_SPA_MARKERS_RE = re.compile(
+    r'(?P<has_next_js>id="__next"|__NEXT_DATA__)'
+    r'|(?P<has_react>(?i:data-reactroot))'
+    r'|(?P<has_nuxt>window\.__NUXT__)'
+    r'|(?P<has_angular>ng-version)'
+)
+
+# Any SPA marker at all, for the JS-rendering fallback decision
+_SPA_PAGE_RE = re.compile(
+    r'(?i:id="__next")|__NEXT_DATA__|data-reactroot|window\.__NUXT__|ng-version'
+)
+
+def detect_spa_markers(html: str) -> Dict[str, bool]:
+    """Report which SPA framework markers occur in the HTML, in a single scan."""
+    markers = dict.fromkeys(_SPA_MARKERS_RE.groupindex, False)
+    for match in _SPA_MARKERS_RE.finditer(html):
+        markers[match.lastgroup] = True
+        if all(markers.values()):
+            break
+    return markers
 
 async def fetch_html(url: str) -> str:
     """Fetch raw HTML from a URL with proper error handling."""
     try:
-        headers = {
-            "User-Agent": settings.USER_AGENT,
-            "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,image/webp,*/*;q=0.8",
-            "Accept-Language": "cs,en-US;q=0.7,en;q=0.3",
-            "Accept-Encoding": "gzip, deflate, br",
-            "DNT": "1",
-            "Connection": "keep-alive",
-            "Upgrade-Insecure-Requests": "1",
-        }
-        
-        async with httpx.AsyncClient(
-            timeout=settings.REQUEST_TIMEOUT,
-            headers=headers,
-            follow_redirects=True
-        ) as client:
-            response = await client.get(url)
-            response.raise_for_status()
-            return response.text
+        # Shared pooled client, so repeat hosts reuse connections
+        response = await get_client().get(
+            url, headers=DEFAULT_HEADERS, timeout=settings.REQUEST_TIMEOUT
+        )
+        response.raise_for_status()
+        return response.text
     except httpx.TimeoutException:
         raise Exception(f"Timeout while fetching {url}")
     except httpx.HTTPStatusError as e:
@@ -38,36 +106,35 @@ async def fetch_html_with_js_fallback(url: str) -> str:
     """
     # Mock mode for testing
     if settings.USE_MOCK:
-        return await _mock_fetch_html(url)
+        return _mock_fetch_html(url)
     
     try:
         # First try static HTTP request
         html = await fetch_html(url)
         
-        # Quick check if we got meaningful content
-        extracted = extract_menu_text(html)
+        # Heuristics for SPA/JS-heavy pages; these get rendered anyway,
+        # so the static text is only extracted for the other pages
+        spa_markers = _SPA_PAGE_RE.search(html) is not None
 
-        # Heuristics for SPA/JS-heavy pages
-        spa_markers = (
-            'id="__next"' in html.lower() or
-            'id="__next"' in html or
-            '__NEXT_DATA__' in html or
-            'data-reactroot' in html or
-            'window.__NUXT__' in html or
-            'ng-version' in html
-        )
+        reason = None
+        if spa_markers:
+            reason = "SPA markers"
+        else:
+            # Extracting the text parses the page, so run it off the event loop
+            static_text = await asyncio.to_thread(extract_menu_text, html)
+            if len(static_text.strip()) < 150:
+                reason = "too little text"
 
-        # If we got very little content or page looks like SPA, try JavaScript rendering
-        if len(extracted.strip()) < 150 or spa_markers:
+        # If page looks like SPA or we got very little content, try JavaScript rendering
+        if reason:
             try:
                 from app.fetch.js_scraper import fetch_js_html
-                reason = f"{len(extracted)} chars" + (" + SPA markers" if spa_markers else "")
-                print(f"Static content insufficient ({reason}), trying JavaScript rendering...")
+                logger.info("Static content insufficient (%s), trying JavaScript rendering...", reason)
                 html = await fetch_js_html(url)
             except ImportError:
-                print("Playwright not available, using static content")
+                logger.warning("Playwright not available, using static content")
             except Exception as e:
-                print(f"JavaScript rendering failed: {e}, using static content")
+                logger.warning("JavaScript rendering failed: %s, using static content", e)
         
         return html
         
@@ -75,7 +142,7 @@ async def fetch_html_with_js_fallback(url: str) -> str:
         # If static request fails, try JavaScript as last resort
         try:
             from app.fetch.js_scraper import fetch_js_html
-            print(f"Static request failed: {e}, trying JavaScript rendering...")
+            logger.warning("Static request failed: %s, trying JavaScript rendering...", e)
             return await fetch_js_html(url)
         except ImportError:
             raise Exception(f"Both static and JavaScript fetching failed. Static error: {e}")
@@ -84,47 +151,41 @@ async def fetch_html_with_js_fallback(url: str) -> str:
 
 def extract_menu_text(html: str) -> str:
     """Extract visible text from HTML, focusing on menu content."""
-    soup = BeautifulSoup(html, "html.parser")
-    
+    return menu_text_from_tree(parse_html(html))
+
+def menu_text_from_tree(tree: lxml_html.HtmlElement) -> str:
+    """extract_menu_text() on an already parsed tree; script/style/nav/header/footer are stripped in place."""
     # Remove script and style elements
-    for script in soup(["script", "style", "nav", "header", "footer"]):
-        script.decompose()
+    etree.strip_elements(tree, *_DROP_TAGS, with_tail=False)
     
     menu_text = []
+    seen = set()
     
-    # Enhanced menu-specific selectors in order of priority
-    menu_selectors = [
-        # Czech menu terms
-        "[id*='menu' i]", "[class*='menu' i]",
-        "[id*='jidlo' i]", "[class*='jidlo' i]", 
-        "[id*='jidelni' i]", "[class*='jidelni' i]",
-        "[id*='listek' i]", "[class*='listek' i]",
-        "[id*='dnes' i]", "[class*='dnes' i]",
-        "[id*='denni' i]", "[class*='denni' i]",
-        "[id*='poledni' i]", "[class*='poledni' i]",
-        "[id*='dnesni' i]", "[class*='dnesni' i]",
-        
-        # English menu terms  
-        "[id*='daily' i]", "[class*='daily' i]",
-        "[id*='lunch' i]", "[class*='lunch' i]",
-        "[id*='food' i]", "[class*='food' i]",
-        "[id*='dish' i]", "[class*='dish' i]",
-        
-        # Common menu container patterns
-        ".content", ".main", ".main-content", 
-        "#content", "#main", "#main-content",
-        ".container", ".wrapper", ".page-content"
-    ]
+    def add(text: str):
+        # One line per block, skipping repeated phrases (common in navigation)
+        line = _WHITESPACE_RE.sub(' ', text).strip()
+        if len(line) <= 5:
+            return
+        # Long blocks are remembered by a short digest, so lookups don't
+        # rehash and compare kilobyte-long strings
+        key = line if len(line) < _DIGEST_MIN_LENGTH else blake2b(line.encode(), digest_size=16).digest()
+        if key not in seen:
+            seen.add(key)
+            menu_text.append(line)
     
     # Try to find menu-specific elements first
     found_menu_content = False
-    for selector in menu_selectors:
-        elements = soup.select(selector)
-        for element in elements:
-            text = element.get_text(" ", strip=True)
+    for selector in _MENU_SELECTOR_GROUPS:
+        outer = None
+        for element in select(tree, selector):
+            # Matches come in document order; skip ones nested in a collected element
+            if outer is not None and outer in element.iterancestors():
+                continue
+            text = get_text(element, " ")
             if text and len(text) > 30:  # Longer threshold for meaningful content
-                menu_text.append(text)
+                add(text)
                 found_menu_content = True
+                outer = element
         
         # If we found good menu content, prioritize it
         if found_menu_content and menu_text:
@@ -133,43 +194,25 @@ def extract_menu_text(html: str) -> str:
     # If no menu-specific content found, use more comprehensive extraction
     if not menu_text:
         # Get all text content, but prioritize certain tags
-        priority_tags = ["main", "article", "section"]
-        for tag_name in priority_tags:
-            for tag in soup.find_all(tag_name):
-                text = tag.get_text(" ", strip=True)
+        for tag_name in _PRIORITY_TAGS:
+            for tag in tree.iter(tag_name):
+                text = get_text(tag, " ")
                 if text and len(text) > 50:
-                    menu_text.append(text)
+                    add(text)
         
         # Fallback to general content extraction
         if not menu_text:
-            for tag in soup.find_all(["h1", "h2", "h3", "h4", "h5", "h6", "p", "li", "td", "span", "div"]):
-                text = tag.get_text(" ", strip=True)
+            for tag in tree.iter(*_FALLBACK_TAGS):
+                text = get_text(tag, " ")
                 # Filter meaningful text that might contain menu info
                 if (text and 
                     len(text) > 15 and 
                     len(text) < 500 and  # Not too long
-                    not text.lower().startswith(('cookie', 'gdpr', 'consent', 'terms', 'privacy')) and
-                    any(char.isalpha() for char in text)):  # Contains letters
-                    menu_text.append(text)
+                    not text.lower().startswith(_BOILERPLATE_PREFIXES) and
+                    _HAS_LETTER_RE.search(text)):  # Contains letters
+                    add(text)
     
-    # Join and clean the text
-    full_text = "\n".join(menu_text)
-    
-    # Additional text cleaning
-    import re
-    # Remove excessive whitespace
-    full_text = re.sub(r'\s+', ' ', full_text)
-    # Remove repeated phrases (common in navigation)
-    lines = full_text.split('\n')
-    unique_lines = []
-    seen = set()
-    for line in lines:
-        line = line.strip()
-        if line and line not in seen and len(line) > 5:
-            unique_lines.append(line)
-            seen.add(line)
-    
-    return "\n".join(unique_lines)
+    return "\n".join(menu_text)
 
 def normalize_price(price_text: str) -> Optional[int]:
     """
@@ -179,20 +222,13 @@ def normalize_price(price_text: str) -> Optional[int]:
     if not price_text:
         return None
     
-    # Remove common currency symbols and separators
-    import re
     # Extract numbers, handling Czech format (145,- or 145,50)
-    match = re.search(r'(\d+)(?:[,.-]\d*)?', str(price_text))
+    match = _PRICE_NUMBER_RE.search(str(price_text))
     if match:
         return int(match.group(1))
     return None
 
-async def _mock_fetch_html(url: str) -> str:
-    """Mock HTML fetcher for testing without network requests"""
-    
-    # Generate different mock content based on URL
-    if "hradcany" in url.lower():
-        return """
+_MOCK_HRADCANY_HTML = """
         <html>
         <head><title>Restaurace Hradčany</title></head>
         <body>
@@ -232,9 +268,8 @@ async def _mock_fetch_html(url: str) -> str:
         </body>
         </html>
         """
-    
-    elif "vlasta" in url.lower():
-        return """
+
+_MOCK_VLASTA_HTML = """
         <html>
         <body>
             <h1>Restaurace Vlasta</h1>
@@ -261,9 +296,8 @@ async def _mock_fetch_html(url: str) -> str:
         </body>
         </html>
         """
-    
-    elif "ujezdu" in url.lower():
-        return """
+
+_MOCK_UJEZDU_HTML = """
         <html>
         <body>
             <div class="restaurant-header">
@@ -290,10 +324,9 @@ async def _mock_fetch_html(url: str) -> str:
         </body>
         </html>
         """
-    
-    else:
-        # Generic mock restaurant
-        return """
+
+# Generic mock restaurant
+_MOCK_GENERIC_HTML = """
         <html>
         <body>
             <h1>Test Restaurant</h1>
@@ -306,3 +339,20 @@ async def _mock_fetch_html(url: str) -> str:
         </body>
         </html>
         """
+
+# URL keyword -> mock page, checked in order
+_MOCK_PAGES = {
+    "hradcany": _MOCK_HRADCANY_HTML,
+    "vlasta": _MOCK_VLASTA_HTML,
+    "ujezdu": _MOCK_UJEZDU_HTML,
+}
+
+def _mock_fetch_html(url: str) -> str:
+    """Mock HTML fetcher for testing without network requests"""
+    
+    # Generate different mock content based on URL
+    url_lower = url.lower()
+    for keyword, html in _MOCK_PAGES.items():
+        if keyword in url_lower:
+            return html
+    return _MOCK_GENERIC_HTML
@@ -1,18 +1,52 @@
 import re
+import time
 from datetime import datetime
+from functools import lru_cache
 from zoneinfo import ZoneInfo
 from typing import Optional
 
 CZ_TZ = ZoneInfo("Europe/Prague")
 CZ_WEEKDAYS = ["pondělí", "úterý", "středa", "čtvrtek", "pátek", "sobota", "neděle"]
+_WEEKDAY_ABBREVS = (
+    ("po", "pondělí"), ("út", "úterý"), ("st", "středa"),
+    ("čt", "čtvrtek"), ("pá", "pátek"), ("so", "sobota"), ("ne", "neděle"),
+)
+
+_NON_PRICE_CHARS_RE = re.compile(r'[^\d,.-]')
+_PRICE_RE = re.compile(r'(\d+)(?:[,.-]\d*)?')
+_KG_RE = re.compile(r'([\d.]+)\s*kg')
+_L_RE = re.compile(r'([\d.]+)\s*l(?:itr)?')
+_G_RE = re.compile(r'(\d+)\s*g')
+_ML_RE = re.compile(r'(\d+)\s*ml')
+_PORTION_RE = re.compile(r'(\d+)\s*(ks|kus|porce|portion)')
+# Allergen codes in parentheses or brackets: (1,3,9) or [1,3,9], or after
+# "alergeny:" / "allergens:" (accented variants included), in one pass
+_ALLERGEN_RE = re.compile(
+    r'[\(\[](?P<bracket>[0-9,\s]+)[\)\]]'
+    r'|(?:alerg[eěé]ny?[:]?|allergens?[:]?)[\s]*(?P<label>[0-9,\s]+)',
+    re.IGNORECASE
+)
+
+@lru_cache(maxsize=2)
+def _prague_today(minute_key: int):
+    # Prague's UTC offset is whole hours, so local midnight falls on a
+    # minute boundary and the date is exact for the whole minute
+    return datetime.now(CZ_TZ).date()
+
+@lru_cache(maxsize=2)
+def _prague_today_iso(minute_key: int) -> str:
+    return _prague_today(minute_key).isoformat()
+
+def _today():
+    return _prague_today(int(time.time()) // 60)
 
 def today_prague_str() -> str:
     """Get today's date in Prague timezone as ISO string"""
-    return datetime.now(CZ_TZ).date().isoformat()
+    return _prague_today_iso(int(time.time()) // 60)
 
 def get_current_weekday_czech() -> str:
     """Get current weekday in Czech"""
-    idx = datetime.now(CZ_TZ).weekday()  # 0=Monday, 1=Tuesday, etc.
+    idx = _today().weekday()  # 0=Monday, 1=Tuesday, etc.
     return CZ_WEEKDAYS[idx]
 
 def detect_weekday_from_text(text: str) -> str:
@@ -29,12 +63,7 @@ def detect_weekday_from_text(text: str) -> str:
             return weekday
     
     # Also check for common abbreviations
-    abbrevs = {
-        "po": "pondělí", "út": "úterý", "st": "středa", 
-        "čt": "čtvrtek", "pá": "pátek", "so": "sobota", "ne": "neděle"
-    }
-    
-    for abbrev, full_name in abbrevs.items():
+    for abbrev, full_name in _WEEKDAY_ABBREVS:
         if abbrev in text_lower:
             return full_name
     
@@ -49,14 +78,14 @@ def normalize_price_human(price_text: str) -> Optional[int]:
         return None
         
     # Remove spaces and common currency indicators
-    cleaned = re.sub(r'[^\d,.-]', '', str(price_text))
+    cleaned = _NON_PRICE_CHARS_RE.sub('', str(price_text))
     
     # Handle Czech format: 145,- or 145,-
     if ',-' in cleaned:
         cleaned = cleaned.replace(',-', '')
     
     # Extract first number sequence
-    match = re.search(r'(\d+)(?:[,.-]\d*)?', cleaned)
+    match = _PRICE_RE.search(cleaned)
     if match:
         return int(match.group(1))
     
@@ -73,28 +102,28 @@ def convert_weight_to_string(text: str) -> Optional[str]:
     text_clean = text.lower().replace(',', '.')
     
     # Check for kg -> g conversion
-    kg_match = re.search(r'([\d.]+)\s*kg', text_clean)
+    kg_match = _KG_RE.search(text_clean)
     if kg_match:
         kg_value = float(kg_match.group(1))
         return f"{int(kg_value * 1000)}g"
     
     # Check for liters -> ml conversion  
-    l_match = re.search(r'([\d.]+)\s*l(?:itr)?', text_clean)
+    l_match = _L_RE.search(text_clean)
     if l_match:
         l_value = float(l_match.group(1))
         return f"{int(l_value * 1000)}ml"
     
     # Check for direct g/ml
-    g_match = re.search(r'(\d+)\s*g', text_clean)
+    g_match = _G_RE.search(text_clean)
     if g_match:
         return f"{g_match.group(1)}g"
         
-    ml_match = re.search(r'(\d+)\s*ml', text_clean)
+    ml_match = _ML_RE.search(text_clean)
     if ml_match:
         return f"{ml_match.group(1)}ml"
     
     # Check for portions/pieces
-    portion_match = re.search(r'(\d+)\s*(ks|kus|porce|portion)', text_clean)
+    portion_match = _PORTION_RE.search(text_clean)
     if portion_match:
         return f"{portion_match.group(1)} {portion_match.group(2)}"
     
@@ -108,26 +137,12 @@ def extract_allergens(text: str) -> list[str]:
     if not text:
         return []
     
-    allergens = []
-    
-    # Pattern for parentheses or brackets: (1,3,9) or [1,3,9]
-    bracket_pattern = r'[\(\[]([0-9,\s]+)[\)\]]'
-    matches = re.findall(bracket_pattern, text)
-    
-    for match in matches:
-        # Split by comma and clean up
-        nums = [num.strip() for num in match.split(',') if num.strip().isdigit()]
-        allergens.extend(nums)
-    
-    # Pattern for "alergeny:" or "allergens:" followed by numbers
-    # Updated to handle accented characters better
-    allergen_pattern = r'(?:alerg[eěé]ny?[:]?|allergens?[:]?)[\s]*([0-9,\s]+)'
-    matches = re.findall(allergen_pattern, text.lower())
+    matches = _ALLERGEN_RE.findall(text)
+    if not matches:
+        return []
     
-    for match in matches:
-        nums = [num.strip() for num in match.split(',') if num.strip().isdigit()]
-        allergens.extend(nums)
+    # All matched code lists split in one go; findall gives (bracket, label)
+    codes = ",".join(bracket or label for bracket, label in matches)
     
-    # Remove duplicates and sort
-    unique_allergens = sorted(list(set(allergens)))
-    return unique_allergens
+    # Sorted unique codes
+    return sorted({code for code in map(str.strip, codes.split(',')) if code.isdigit()})
@@ -1,7 +1,18 @@
-import json
+import asyncio
+import logging
+import re
+from functools import lru_cache
 from typing import Dict, Any, Optional
+import orjson
 from app.core.config import settings
-from app.fetch.utils import normalize_price_human, convert_weight_to_string, extract_allergens
+from app.fetch.utils import (
+    normalize_price_human, convert_weight_to_string, extract_allergens, get_current_weekday_czech
+)
+
+logger = logging.getLogger(__name__)
+
+# Outermost {...} in a response that has extra text around the JSON
+_JSON_OBJECT_RE = re.compile(r'\{.*\}', re.DOTALL)
 
 class MenuParsingTools:
     """Function tools for LLM to help parse menu data"""
@@ -27,6 +38,60 @@ class MenuParsingTools:
         """Extract allergen codes from text"""
         return extract_allergens(text)
 
+@lru_cache(maxsize=64)
+def _prompt_prefix(today_iso: str, weekday_cs: str, source_url: str, use_html: bool) -> str:
+    """Static part of the parsing prompt; the menu body is appended per attempt"""
+    content_type = "HTML structure" if use_html else "extracted text"
+    return (
+        f"You are a Czech restaurant menu parser. Parse the given menu {content_type} into structured JSON.\n\n"
+        f"Today's date: {today_iso}\n"
+        f"Day of week: {weekday_cs}\n"
+        f"Source URL: {source_url}\n\n"
+        "IMPORTANT: Return ONLY valid JSON without any additional text or markdown formatting.\n\n"
+        "Required JSON format:\n"
+        "{\n"
+        "  \"restaurant_name\": \"Name of restaurant or 'Unknown Restaurant' if not found\",\n"
+        f"  \"date\": \"{today_iso}\",\n"
+        "  \"day_of_week\": \"pondělí|úterý|středa|čtvrtek|pátek|sobota|neděle\",\n"
+        "  \"menu_items\": [\n"
+        "    {\n"
+        "      \"category\": \"polévka|hlavní chod|salát|dezert|nápoj|příloha\",\n"
+        "      \"name\": \"Dish name\",\n"
+        "      \"price\": 145,\n"
+        "      \"allergens\": [\"1\", \"3\", \"9\"],\n"
+        "      \"weight\": \"150g\"\n"
+        "    }\n"
+        "  ],\n"
+        "  \"daily_menu\": true,\n"
+        f"  \"source_url\": \"{source_url}\"\n"
+        "}\n\n"
+        f"Rules for {content_type} parsing:\n"
+        "1. Extract restaurant name from the content (look for headings, titles, business names)\n"
+        f"2. Determine if this is TODAY'S specific daily menu for {weekday_cs} ({today_iso}):\n"
+        f"   - Set daily_menu=true if menu explicitly shows today's date or weekday\n"
+        f"   - Set daily_menu=false if menu shows different dates/weekdays, or is a general/permanent menu\n"
+        "   - Extract day_of_week from menu content if explicitly mentioned\n"
+        "3. Categorize each menu item appropriately:\n"
+        "   - \"polévka\" for soups\n"
+        "   - \"hlavní chod\" for main dishes, meat, pasta, rice dishes\n"
+        "   - \"salát\" for salads\n"
+        "   - \"dezert\" for desserts, sweets\n"
+        "   - \"nápoj\" for drinks, beverages\n"
+        "   - \"příloha\" for side dishes, bread, garnish\n"
+        "4. For prices: convert \"145,-\", \"120 Kč\", \"95.50\", \"€15\" etc. to integer CZK (145, 120, 95, 375)\n"
+        "5. Parse allergen codes from patterns like \"(1,3,9)\" or \"alergeny: 1,3,9\" as string array\n"
+        "6. Include weight/portion info if available, standardize units (kg→g, l→ml)\n"
+        "7. If multiple dates found in menu, extract the one that matches items and set daily_menu accordingly\n"
+        "8. If no menu items found, return empty array for menu_items\n"
+        "9. ALWAYS include all required fields, use sensible defaults if information not available\n\n"
+        f"{'HTML structure analysis:' if use_html else 'Text content analysis:'}\n"
+        f"- {'Look for table structures, list items, and div containers for menu items' if use_html else 'Extract information from the processed text content'}\n"
+        f"- {'Pay attention to HTML classes/IDs that might indicate menu sections' if use_html else 'Look for price patterns and section headers in text'}\n"
+        f"- {'Tables often contain structured menu data with prices in separate columns' if use_html else 'Sequential text often groups items by category'}\n"
+        f"- LOOK for date/weekday indicators to determine if this is today's menu or a different day\n\n"
+        f"Parse this menu {content_type}:\n\n"
+    )
+
 def get_gemini_model():
     """Get configured Gemini model"""
     if not settings.GOOGLE_API_KEY:
@@ -52,72 +117,21 @@ async def summarize_menu(
     Can work with either text extraction or direct HTML for better structure understanding.
     """
     if settings.USE_MOCK:
-        return await _mock_summarize_menu(raw_text, today_iso, weekday_cs, source_url)
-    
-    model = get_gemini_model()
+        return _mock_summarize_menu(raw_text, today_iso, weekday_cs, source_url)
 
     # Decide content mode
     use_html = html_content is not None and len(str(html_content).strip()) > 0
     original_content = html_content if use_html else raw_text
-    content_type = "HTML structure" if use_html else "extracted text"
 
-    def build_prompt(body: str) -> str:
-        return (
-            f"You are a Czech restaurant menu parser. Parse the given menu {content_type} into structured JSON.\n\n"
-            f"Today's date: {today_iso}\n"
-            f"Day of week: {weekday_cs}\n"
-            f"Source URL: {source_url}\n\n"
-            "IMPORTANT: Return ONLY valid JSON without any additional text or markdown formatting.\n\n"
-            "Required JSON format:\n"
-            "{\n"
-            "  \"restaurant_name\": \"Name of restaurant or 'Unknown Restaurant' if not found\",\n"
-            f"  \"date\": \"{today_iso}\",\n"
-            "  \"day_of_week\": \"pondělí|úterý|středa|čtvrtek|pátek|sobota|neděle\",\n"
-            "  \"menu_items\": [\n"
-            "    {\n"
-            "      \"category\": \"polévka|hlavní chod|salát|dezert|nápoj|příloha\",\n"
-            "      \"name\": \"Dish name\",\n"
-            "      \"price\": 145,\n"
-            "      \"allergens\": [\"1\", \"3\", \"9\"],\n"
-            "      \"weight\": \"150g\"\n"
-            "    }\n"
-            "  ],\n"
-            "  \"daily_menu\": true,\n"
-            f"  \"source_url\": \"{source_url}\"\n"
-            "}\n\n"
-            f"Rules for {content_type} parsing:\n"
-            "1. Extract restaurant name from the content (look for headings, titles, business names)\n"
-            f"2. Determine if this is TODAY'S specific daily menu for {weekday_cs} ({today_iso}):\n"
-            f"   - Set daily_menu=true if menu explicitly shows today's date or weekday\n"
-            f"   - Set daily_menu=false if menu shows different dates/weekdays, or is a general/permanent menu\n"
-            "   - Extract day_of_week from menu content if explicitly mentioned\n"
-            "3. Categorize each menu item appropriately:\n"
-            "   - \"polévka\" for soups\n"
-            "   - \"hlavní chod\" for main dishes, meat, pasta, rice dishes\n"
-            "   - \"salát\" for salads\n"
-            "   - \"dezert\" for desserts, sweets\n"
-            "   - \"nápoj\" for drinks, beverages\n"
-            "   - \"příloha\" for side dishes, bread, garnish\n"
-            "4. For prices: convert \"145,-\", \"120 Kč\", \"95.50\", \"€15\" etc. to integer CZK (145, 120, 95, 375)\n"
-            "5. Parse allergen codes from patterns like \"(1,3,9)\" or \"alergeny: 1,3,9\" as string array\n"
-            "6. Include weight/portion info if available, standardize units (kg→g, l→ml)\n"
-            "7. If multiple dates found in menu, extract the one that matches items and set daily_menu accordingly\n"
-            "8. If no menu items found, return empty array for menu_items\n"
-            "9. ALWAYS include all required fields, use sensible defaults if information not available\n\n"
-            f"{'HTML structure analysis:' if use_html else 'Text content analysis:'}\n"
-            f"- {'Look for table structures, list items, and div containers for menu items' if use_html else 'Extract information from the processed text content'}\n"
-            f"- {'Pay attention to HTML classes/IDs that might indicate menu sections' if use_html else 'Look for price patterns and section headers in text'}\n"
-            f"- {'Tables often contain structured menu data with prices in separate columns' if use_html else 'Sequential text often groups items by category'}\n"
-            f"- LOOK for date/weekday indicators to determine if this is today's menu or a different day\n\n"
-            f"Parse this menu {content_type}:\n\n"
-            f"{body}"
-        )
+    model = get_gemini_model()
 
     def shrink_text(text: str, limit: int) -> str:
         if len(text) <= limit:
             return text
         return text[:limit] + "..."
 
+    prefix = _prompt_prefix(today_iso, weekday_cs, source_url, use_html)
+
     # Progressive shrinking limits for retries
     limits = [6000, 4000, 2000]
     max_attempts = min(settings.LLM_MAX_ATTEMPTS, len(limits)) if settings.LLM_MAX_ATTEMPTS else 3
@@ -126,11 +140,15 @@ async def summarize_menu(
     for attempt in range(max_attempts):
         limit = limits[attempt]
         body = shrink_text(original_content, limit)
-        prompt = build_prompt(body)
+        prompt = prefix + body
 
         try:
-            print(f"LLM ATTEMPT {attempt+1}/{max_attempts}: content_len={len(body)}, timeout={settings.LLM_TIMEOUT_SECONDS}s")
-            response = model.generate_content(prompt)
+            logger.info(
+                "LLM ATTEMPT %d/%d: content_len=%d, timeout=%ss",
+                attempt + 1, max_attempts, len(body), settings.LLM_TIMEOUT_SECONDS
+            )
+            # The SDK call is synchronous; keep it off the event loop
+            response = await asyncio.to_thread(model.generate_content, prompt)
 
             if not response.text:
                 raise ValueError("Empty response from Gemini")
@@ -145,7 +163,7 @@ async def summarize_menu(
 
             # Try to parse JSON
             try:
-                parsed_data = json.loads(content)
+                parsed_data = orjson.loads(content)
 
                 # Post-process prices to ensure they're integers
                 for item in parsed_data.get('menu_items', []):
@@ -156,38 +174,34 @@ async def summarize_menu(
                 # Post-process day_of_week: if daily_menu=false, set to today's weekday
                 is_daily_menu = parsed_data.get('daily_menu', True)
                 if not is_daily_menu:
-                    # Import here to get fresh current weekday
-                    from app.fetch.utils import get_current_weekday_czech
                     current_weekday = get_current_weekday_czech()
-                    print(f"Setting day_of_week to today ({current_weekday}) because daily_menu=false")
+                    logger.info("Setting day_of_week to today (%s) because daily_menu=false", current_weekday)
                     parsed_data['day_of_week'] = current_weekday
-                
-                return parsed_data
 
-            except json.JSONDecodeError:
-                import re
-                json_match = re.search(r'\{.*\}', content, re.DOTALL)
+            except orjson.JSONDecodeError:
+                json_match = _JSON_OBJECT_RE.search(content)
                 if json_match:
-                    return json.loads(json_match.group())
+                    parsed_data = orjson.loads(json_match.group())
                 else:
                     raise ValueError(f"No valid JSON found in Gemini response: {content[:200]}...")
 
+            return parsed_data
+
         except Exception as e:
             last_error = e
             # Retry on timeouts or transient errors
             msg = str(e).lower()
             is_timeout = "timeout" in msg or "504" in msg or "deadline" in msg
             if attempt < max_attempts - 1 and is_timeout:
-                import time
                 backoff = 0.7 * (attempt + 1)
-                print(f"LLM TIMEOUT/TRANSIENT ERROR, retrying in {backoff:.1f}s... ({e})")
-                time.sleep(backoff)
+                logger.warning("LLM TIMEOUT/TRANSIENT ERROR, retrying in %.1fs... (%s)", backoff, e)
+                await asyncio.sleep(backoff)
                 continue
             break
 
     raise Exception(f"Gemini parsing failed: {str(last_error) if last_error else 'Unknown error'}")
 
-async def _mock_summarize_menu(
+def _mock_summarize_menu(
     raw_text: str, 
     today_iso: str, 
     weekday_cs: str, 
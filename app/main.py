@@ -1,7 +1,13 @@
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
 from fastapi import FastAPI
+from fastapi.responses import ORJSONResponse
 from contextlib import asynccontextmanager
 from app.api.routes import router
+from app.core.config import settings
 from app.cache import db as cache_db
+from app.core.log import setup_logging, shutdown_logging
+from app.fetch.http_client import close_client
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -10,7 +16,12 @@ async def lifespan(app: FastAPI):
     Initialize resources on startup, cleanup on shutdown.
     """
     # Startup
+    setup_logging()
     print("Initializing Restaurant Menu Summarizer...")
+    # One bounded pool for every asyncio.to_thread call (parsing and cache)
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=settings.WORKER_THREADS, thread_name_prefix="worker")
+    )
     cache_db.init_db()
     print("Database initialized successfully")
     
@@ -18,12 +29,21 @@ async def lifespan(app: FastAPI):
     
     # Shutdown
     print("Shutting down Restaurant Menu Summarizer...")
+    cache_db.close_db()
+    await close_client()
+    try:
+        from app.fetch.js_scraper import close_browser
+        await close_browser()
+    except ImportError:
+        pass
+    shutdown_logging()
 
 app = FastAPI(
     title="Restaurant Menu Summarizer",
     description="API for extracting and summarizing Czech restaurant menus",
     version="1.0.0",
-    lifespan=lifespan
+    lifespan=lifespan,
+    default_response_class=ORJSONResponse
 )
 
 # Include API routes
@@ -37,7 +57,9 @@ async def root():
         "version": "1.0.0",
         "endpoints": {
             "summarize": "POST /summarize",
+            "summarize_batch": "POST /summarize-batch",
             "health": "GET /health",
-            "cache_stats": "GET /cache/stats"
+            "cache_stats": "GET /cache/stats",
+            "metrics": "GET /metrics"
         }
     }
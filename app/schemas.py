@@ -22,3 +22,15 @@ class SummarizeRequest(BaseModel):
 class SummarizeResponse(BaseModel):
     cached: bool
     data: MenuData
+
+class SummarizeBatchRequest(BaseModel):
+    urls: List[str]
+
+class SummarizeBatchItem(BaseModel):
+    url: str
+    cached: Optional[bool] = None
+    data: Optional[MenuData] = None
+    error: Optional[str] = None
+
+class SummarizeBatchResponse(BaseModel):
+    results: List[SummarizeBatchItem]
@@ -1,125 +1,132 @@
-import json
-from typing import Dict, Any
+import asyncio
+import logging
+from typing import Dict, Any, Optional, List, Union
+import orjson
+from app.core.config import settings
 from app.fetch import scraper
-from app.fetch.html_analyzer import (
-    should_use_html_mode, 
-    get_menu_focused_html, 
-    extract_date_info_from_html,
-    clean_html_for_llm,
-    clean_body_text_for_llm
-)
+from app.fetch.html_analyzer import parse_and_extract
 from app.fetch.utils import today_prague_str, detect_weekday_from_text
 from app.cache import db as cache_db
 from app.llm import client as llm_client
 from app.schemas import MenuData
 
+logger = logging.getLogger(__name__)
+
+# Day of the last purge in this process; entries only expire when the date changes
+_last_purge_date: Optional[str] = None
+
 async def process_menu_request(url: str) -> Dict[str, Any]:
     """
     Main pipeline for processing menu summarization request.
     
     1. Calculate today's date (Europe/Prague timezone)
-    2. Purge old cache entries
-    3. Check cache for existing data
-    4. If not cached: fetch -> extract -> LLM -> validate -> cache
-    5. Return structured response
+    2. Check cache for existing data
+    3. If not cached: purge old entries (once per day) -> fetch -> extract -> LLM -> validate -> cache
+    4. Return structured response ("data" is the decoded cache dict on a hit,
+       the validated MenuData on a miss)
     """
+    global _last_purge_date
     
     # Get today's date in Prague timezone
     today = today_prague_str()
     
-    # Clean up old cache entries
-    cache_db.purge_old(today)
-    
-    
     # Check cache first
-    cached_payload = cache_db.get(url, today)
+    cached_payload = await cache_db.aget(url, today)
     if cached_payload:
         try:
-            cached_data = json.loads(cached_payload)
-            print(f"CACHE HIT for {url} on {today}")
+            cached_data = orjson.loads(cached_payload)
+            logger.info("CACHE HIT for %s on %s", url, today)
             return {"cached": True, "data": cached_data}
-        except json.JSONDecodeError:
-            print(f"CACHE CORRUPTED for {url}, proceeding with fresh fetch")
+        except orjson.JSONDecodeError:
+            logger.warning("CACHE CORRUPTED for %s, proceeding with fresh fetch", url)
             pass
     
+    # Clean up old cache entries, keeping cache hits read-only
+    if _last_purge_date != today:
+        await cache_db.apurge_old(today)
+        _last_purge_date = today
+    
     # Fresh processing pipeline
     try:
-        print(f"PROCESSING {url} - fetching HTML...")
+        logger.info("PROCESSING %s - fetching HTML...", url)
         
         # Step 1: Fetch HTML content
         html = await scraper.fetch_html_with_js_fallback(url)
         if not html:
             raise Exception("No content received from URL")
         
-        print(f"HTML RECEIVED: {len(html)} characters")
+        logger.info("HTML RECEIVED: %d characters", len(html))
         
-        # Step 2: Extract text for fallback
-        menu_text = scraper.extract_menu_text(html)
-        print(f"EXTRACTED TEXT: {len(menu_text)} characters")
-        print(f"TEXT PREVIEW: {menu_text[:500]}...")
+        # Step 2: Extract text for fallback and the cleaned body for the LLM
+        # from a single parse, off the event loop
+        menu_text, cleaned_body_text = await asyncio.to_thread(parse_and_extract, html)
+        logger.info("EXTRACTED TEXT: %d characters", len(menu_text))
+        logger.debug("TEXT PREVIEW: %.500s...", menu_text)
         
         # Step 3: Detect weekday
         weekday = detect_weekday_from_text(menu_text)
-        print(f"DETECTED WEEKDAY: {weekday}")
+        logger.info("DETECTED WEEKDAY: %s", weekday)
         
-        # Prepare cleaned body text for LLM (body-only, tags removed)
-        cleaned_body_text = clean_body_text_for_llm(html)
-
         # Log cleaned text with clear boundaries to separate from other logs
-        print("\n===== CLEANED BODY TEXT BEGIN =====")
-        # Print a preview if very long to avoid flooding logs
-        if len(cleaned_body_text) > 4000:
-            print(cleaned_body_text[:4000] + "... [truncated]")
-        else:
-            print(cleaned_body_text)
-        print("===== CLEANED BODY TEXT END =====\n")
+        if logger.isEnabledFor(logging.DEBUG):
+            # Print a preview if very long to avoid flooding logs
+            preview = cleaned_body_text[:4000] + "... [truncated]" if len(cleaned_body_text) > 4000 else cleaned_body_text
+            logger.debug("\n===== CLEANED BODY TEXT BEGIN =====\n%s\n===== CLEANED BODY TEXT END =====\n", preview)
 
-        # Step 4: Smart LLM processing - avoid timeouts with large HTML
-        html_size_kb = len(html) / 1024
-        
-        if html_size_kb > 200:  # Very large HTML - use text only
-            print(f"VERY LARGE HTML ({html_size_kb:.1f}KB) - using text mode only")
-            structured_data = await llm_client.summarize_menu(
-                raw_text=cleaned_body_text or menu_text,
-                today_iso=today,
-                weekday_cs=weekday,
-                source_url=url,
-                html_content=None
-            )
-        else:
-            # Previously we used raw HTML; now we send the cleaned body text instead
-            print(f"SENDING TO LLM - cleaned text from HTML (size {html_size_kb:.1f}KB)")
-            structured_data = await llm_client.summarize_menu(
-                raw_text=cleaned_body_text or menu_text,
-                today_iso=today,
-                weekday_cs=weekday,
-                source_url=url,
-                html_content=None  # send text, not raw HTML
-            )
+        # Step 4: LLM processing - always the cleaned body text, never raw HTML,
+        # which keeps large pages from timing out
+        logger.info("SENDING TO LLM - cleaned text from HTML (size %.1fKB)", len(html) / 1024)
+        structured_data = await llm_client.summarize_menu(
+            raw_text=cleaned_body_text or menu_text,
+            today_iso=today,
+            weekday_cs=weekday,
+            source_url=url,
+            html_content=None  # send text, not raw HTML
+        )
         
-        print(f"LLM RESPONSE: {structured_data}")
+        logger.debug("LLM RESPONSE: %s", structured_data)
         
         # Step 5: Validate the response using Pydantic
-        menu_data = MenuData(**structured_data)
-        validated_data = menu_data.model_dump()
+        menu_data = MenuData.model_validate(structured_data)
         
-        print(f"VALIDATED DATA: {validated_data}")
+        logger.debug("VALIDATED DATA: %s", menu_data)
         
-        # Step 6: Cache the result
-        cache_payload = json.dumps(validated_data, ensure_ascii=False)
-        cache_db.set(url, today, cache_payload)
+        # Step 6: Cache the result, serialized straight from the model
+        cache_payload = menu_data.model_dump_json()
+        await cache_db.aset(url, today, cache_payload)
         
-        print(f"CACHED RESULT for {url}")
+        logger.info("CACHED RESULT for %s", url)
         
-        return {"cached": False, "data": validated_data}
+        # The validated model itself: response models accept it as is,
+        # where a dumped dict would be validated all over again
+        return {"cached": False, "data": menu_data}
         
     except Exception as e:
-        print(f"ERROR processing {url}: {str(e)}")
+        logger.error("ERROR processing %s: %s", url, e)
         raise Exception(f"Menu processing failed: {str(e)}")
 
-def get_cache_stats() -> Dict[str, Any]:
+async def process_menu_requests(urls: List[str]) -> List[Union[Dict[str, Any], Exception]]:
+    """
+    Run process_menu_request for several URLs concurrently.
+    
+    At most BATCH_MAX_CONCURRENCY pipelines run at once and a URL repeated in
+    the batch is processed only once. Results come back in input order, with
+    the raised exception in place of each failed URL.
+    """
+    sem = asyncio.Semaphore(settings.BATCH_MAX_CONCURRENCY)
+    
+    async def bounded(url: str) -> Dict[str, Any]:
+        async with sem:
+            return await process_menu_request(url)
+    
+    unique_urls = list(dict.fromkeys(urls))
+    results = await asyncio.gather(*[bounded(url) for url in unique_urls], return_exceptions=True)
+    by_url = dict(zip(unique_urls, results))
+    return [by_url[url] for url in urls]
+
+async def get_cache_stats() -> Dict[str, Any]:
     """Get cache statistics for debugging"""
     try:
-        return cache_db.get_stats()
+        return await cache_db.aget_stats()
     except Exception as e:
         return {"error": str(e)}
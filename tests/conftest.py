@@ -1,21 +1,30 @@
-import os
-import tempfile
 import pytest
-import sqlite3
+from fastapi.testclient import TestClient
 from app.cache import db as cache_db
 from app.core import config
+from app.main import app
+
+@pytest.fixture(scope="session")
+def client(tmp_path_factory):
+    """One TestClient for the whole session; the app lifespan runs once"""
+    original_db_path = cache_db.DATABASE_PATH
+    # Keep the startup init_db away from the real cache file
+    cache_db.DATABASE_PATH = str(tmp_path_factory.mktemp("app") / "cache.sqlite")
+    try:
+        with TestClient(app) as test_client:
+            yield test_client
+    finally:
+        cache_db.DATABASE_PATH = original_db_path
 
 @pytest.fixture(autouse=True)
-def setup_test_environment():
+def setup_test_environment(tmp_path):
     """Setup test environment with mock settings"""
     # Store original values
     original_db_path = cache_db.DATABASE_PATH
     original_use_mock = config.settings.USE_MOCK
     
-    # Create temporary database for tests
-    temp_db = tempfile.NamedTemporaryFile(suffix='.sqlite', delete=False)
-    temp_db_path = temp_db.name
-    temp_db.close()
+    # Temporary database for tests; pytest removes tmp_path itself
+    temp_db_path = str(tmp_path / "cache.sqlite")
     
     # Override settings for tests - disable USE_MOCK for integration tests
     cache_db.DATABASE_PATH = temp_db_path
@@ -26,23 +35,9 @@ def setup_test_environment():
     
     yield
     
+    # Close the shared connection so no handle to the file stays open
+    cache_db.close_db()
+    
     # Restore original values
     cache_db.DATABASE_PATH = original_db_path
     config.settings.USE_MOCK = original_use_mock
-    
-    # Cleanup temporary database - close all connections first (Windows fix)
-    try:
-        # Force close any open SQLite connections
-        conn = sqlite3.connect(temp_db_path)
-        conn.close()
-        
-        # Small delay to allow file handle release
-        import time
-        time.sleep(0.1)
-        
-        # Remove file
-        if os.path.exists(temp_db_path):
-            os.unlink(temp_db_path)
-    except Exception:
-        # If cleanup fails, it's not critical for tests
-        pass
@@ -3,13 +3,8 @@ import json
 import tempfile
 import os
 from unittest.mock import AsyncMock, patch
-from fastapi.testclient import TestClient
-from app.main import app
 from app.cache import db as cache_db
 
-# Test client
-client = TestClient(app)
-
 class TestIntegrationSummarize:
     """Integration tests for the /summarize endpoint"""
     
@@ -19,7 +14,7 @@ class TestIntegrationSummarize:
     
     @patch('app.fetch.scraper.fetch_html_with_js_fallback')
     @patch('app.llm.client.summarize_menu')
-    def test_summarize_endpoint_success(self, mock_llm, mock_fetch):
+    def test_summarize_endpoint_success(self, mock_llm, mock_fetch, client):
         """Test successful menu summarization"""
         # Mock HTML content
         mock_fetch.return_value = """
@@ -79,7 +74,7 @@ class TestIntegrationSummarize:
         assert len(menu_data["menu_items"]) == 2
         assert menu_data["daily_menu"] is True
     
-    def test_summarize_invalid_url(self):
+    def test_summarize_invalid_url(self, client):
         """Test endpoint with invalid URL"""
         response = client.post(
             "/summarize",
@@ -89,14 +84,14 @@ class TestIntegrationSummarize:
         assert response.status_code == 400
         assert "must start with http" in response.json()["detail"]
     
-    def test_summarize_missing_url(self):
+    def test_summarize_missing_url(self, client):
         """Test endpoint with missing URL"""
         response = client.post("/summarize", json={})
         
         assert response.status_code == 422  # Validation error
     
     @patch('app.fetch.scraper.fetch_html_with_js_fallback')
-    def test_summarize_fetch_error(self, mock_fetch):
+    def test_summarize_fetch_error(self, mock_fetch, client):
         """Test handling of fetch errors"""
         mock_fetch.side_effect = Exception("Network error")
         
@@ -108,6 +103,78 @@ class TestIntegrationSummarize:
         assert response.status_code == 500
         assert "failed" in response.json()["detail"].lower()
 
+class TestBatchSummarize:
+    """Integration tests for the /summarize-batch endpoint"""
+    
+    @patch('app.fetch.scraper.fetch_html_with_js_fallback')
+    @patch('app.llm.client.summarize_menu')
+    def test_batch_reports_results_per_url(self, mock_llm, mock_fetch, client):
+        """Test that valid URLs are summarized and invalid ones get an error"""
+        mock_fetch.return_value = "<h1>Batch Menu</h1>"
+        
+        async def mock_llm_async(*args, **kwargs):
+            return {
+                "restaurant_name": "Batch Restaurant",
+                "date": "2025-10-27",
+                "day_of_week": "neděle",
+                "menu_items": [],
+                "daily_menu": True,
+                "source_url": kwargs["source_url"]
+            }
+        
+        mock_llm.side_effect = mock_llm_async
+        
+        response = client.post(
+            "/summarize-batch",
+            json={"urls": ["https://batch-one.cz", "not-a-url", "https://batch-two.cz"]}
+        )
+        
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [r["url"] for r in results] == ["https://batch-one.cz", "not-a-url", "https://batch-two.cz"]
+        
+        assert results[0]["cached"] is False
+        assert results[0]["data"]["source_url"] == "https://batch-one.cz"
+        assert "must start with http" in results[1]["error"]
+        assert results[1]["data"] is None
+        assert results[2]["data"]["source_url"] == "https://batch-two.cz"
+        assert mock_llm.call_count == 2
+    
+    @patch('app.fetch.scraper.fetch_html_with_js_fallback')
+    @patch('app.llm.client.summarize_menu')
+    def test_batch_processes_duplicate_urls_once(self, mock_llm, mock_fetch, client):
+        """Test that a URL repeated in one batch goes through the pipeline once"""
+        mock_fetch.return_value = "<h1>Batch Menu</h1>"
+        
+        async def mock_llm_async(*args, **kwargs):
+            return {
+                "restaurant_name": "Batch Restaurant",
+                "date": "2025-10-27",
+                "day_of_week": "neděle",
+                "menu_items": [],
+                "daily_menu": True,
+                "source_url": kwargs["source_url"]
+            }
+        
+        mock_llm.side_effect = mock_llm_async
+        
+        response = client.post(
+            "/summarize-batch",
+            json={"urls": ["https://batch-dup.cz", "https://batch-dup.cz"]}
+        )
+        
+        assert response.status_code == 200
+        results = response.json()["results"]
+        assert [r["data"]["source_url"] for r in results] == ["https://batch-dup.cz"] * 2
+        assert mock_fetch.call_count == 1
+        assert mock_llm.call_count == 1
+    
+    def test_batch_empty_urls(self, client):
+        """Test batch endpoint with no URLs"""
+        response = client.post("/summarize-batch", json={"urls": []})
+        
+        assert response.status_code == 400
+
 class TestCacheIntegration:
     """Integration tests for caching functionality"""
     
@@ -117,7 +184,7 @@ class TestCacheIntegration:
     
     @patch('app.fetch.scraper.fetch_html_with_js_fallback')
     @patch('app.llm.client.summarize_menu')
-    def test_cache_hit_second_request(self, mock_llm, mock_fetch):
+    def test_cache_hit_second_request(self, mock_llm, mock_fetch, client):
         """Test that second request with same URL uses cache"""
         # Mock responses
         mock_fetch.return_value = "<h1>Test Menu</h1>"
@@ -174,13 +241,13 @@ class TestCacheIntegration:
 class TestHealthEndpoints:
     """Test health and utility endpoints"""
     
-    def test_health_endpoint(self):
+    def test_health_endpoint(self, client):
         """Test health check endpoint"""
         response = client.get("/health")
         assert response.status_code == 200
         assert response.json()["status"] == "healthy"
     
-    def test_root_endpoint(self):
+    def test_root_endpoint(self, client):
         """Test root endpoint"""
         response = client.get("/")
         assert response.status_code == 200
@@ -188,9 +255,17 @@ class TestHealthEndpoints:
         assert "service" in data
         assert "endpoints" in data
     
-    def test_cache_stats_endpoint(self):
+    def test_cache_stats_endpoint(self, client):
         """Test cache statistics endpoint"""
         response = client.get("/cache/stats")
         assert response.status_code == 200
         data = response.json()
         assert "total_entries" in data
+    
+    def test_metrics_endpoint(self, client):
+        """Test runtime metrics endpoint"""
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        data = response.json()
+        assert data["js_contexts"]["in_use"] == 0
+        assert data["js_contexts"]["free_slots"] == data["js_contexts"]["size"]
@@ -63,10 +63,8 @@ class TestUnitTests:
 class TestIntegration:
     """Integration test - testing full flow"""
     
-    def test_full_api_flow(self):
+    def test_full_api_flow(self, client):
         """Integration test: Test complete API flow with mock"""
-        from fastapi.testclient import TestClient
-        from app.main import app
         from app.core.config import settings
         
         # Enable mock mode for integration test
@@ -74,8 +72,6 @@ class TestIntegration:
         settings.USE_MOCK = True
         
         try:
-            client = TestClient(app)
-            
             # Test health endpoint
             response = client.get("/health")
             assert response.status_code == 200
@@ -1,19 +1,17 @@
+import asyncio
 import pytest
-import tempfile
-import os
 import sqlite3
-import time
+import zlib
 from app.cache import db as cache_db
 
 class TestCache:
     """Unit tests for cache functionality"""
     
-    def setup_method(self):
+    @pytest.fixture(autouse=True)
+    def temp_database(self, tmp_path):
         """Initialize clean database for each test"""
-        # Use temporary database for tests
-        self.temp_db = tempfile.NamedTemporaryFile(suffix='.sqlite', delete=False)
-        self.temp_db_path = self.temp_db.name
-        self.temp_db.close()
+        # Use temporary database for tests; pytest removes tmp_path itself
+        self.temp_db_path = str(tmp_path / "test_cache.sqlite")
         
         # Temporarily override DATABASE_PATH
         self.original_db_path = cache_db.DATABASE_PATH
@@ -21,27 +19,12 @@ class TestCache:
         
         cache_db.init_db()
         cache_db.clear_all()
-    
-    def teardown_method(self):
-        """Clean up after each test"""
-        # Restore original DATABASE_PATH
-        cache_db.DATABASE_PATH = self.original_db_path
         
-        # Windows fix: close all SQLite connections before deleting
-        try:
-            # Force close any open SQLite connections
-            conn = sqlite3.connect(self.temp_db_path)
-            conn.close()
-            
-            # Small delay to allow file handle release
-            time.sleep(0.1)
-            
-            # Remove temporary database
-            if os.path.exists(self.temp_db_path):
-                os.unlink(self.temp_db_path)
-        except Exception:
-            # If cleanup fails, it's not critical for tests
-            pass
+        yield
+        
+        # Close the shared connection before restoring DATABASE_PATH
+        cache_db.close_db()
+        cache_db.DATABASE_PATH = self.original_db_path
     
     def test_cache_set_and_get(self):
         """Test basic cache set and get operations"""
@@ -154,3 +137,74 @@ class TestCache:
         assert cache_db.get("https://test1.com", "2025-10-27") is None
         assert cache_db.get("https://test2.com", "2025-10-27") is None
         assert cache_db.get("https://test1.com", "2025-10-28") is None
+    
+    def test_payload_stored_compressed(self):
+        """Test that payloads are stored as compressed BLOBs"""
+        payload = '{"menu_items": [' + ', '.join(['{"name": "Polévka"}'] * 50) + ']}'
+        cache_db.set("https://test.com", "2025-10-27", payload)
+        
+        conn = sqlite3.connect(self.temp_db_path)
+        stored = conn.execute("SELECT payload FROM cache").fetchone()[0]
+        conn.close()
+        
+        assert isinstance(stored, bytes)
+        assert len(stored) < len(payload.encode("utf-8"))
+        assert cache_db.get("https://test.com", "2025-10-27") == payload
+    
+    def test_legacy_text_payload_rewritten(self):
+        """Test that uncompressed legacy rows are readable and get compressed"""
+        payload = '{"test": "legacy"}'
+        cache_db._connection().execute(
+            "INSERT INTO cache (menu_url, date, payload) VALUES (?, ?, ?)",
+            ("https://test.com", "2025-10-27", payload)
+        )
+        
+        assert cache_db.get("https://test.com", "2025-10-27") == payload
+        
+        stored = cache_db._connection().execute("SELECT payload FROM cache").fetchone()[0]
+        assert isinstance(stored, bytes)
+        assert cache_db.get("https://test.com", "2025-10-27") == payload
+    
+    def test_payload_compressed_without_dictionary_readable(self):
+        """Test that rows compressed before the preset dictionary still load"""
+        payload = '{"restaurant_name": "Restaurace Test", "menu_items": []}'
+        cache_db._connection().execute(
+            "INSERT INTO cache (menu_url, date, payload) VALUES (?, ?, ?)",
+            ("https://test.com", "2025-10-27", zlib.compress(payload.encode("utf-8")))
+        )
+        
+        assert cache_db.get("https://test.com", "2025-10-27") == payload
+    
+    def test_memory_cache_serves_hits(self, monkeypatch):
+        """Test that hot entries are served from memory until the TTL expires"""
+        cache_db.set("https://test.com", "2025-10-27", '{"test": "hot"}')
+        # Remove the row behind the memory cache's back
+        cache_db._connection().execute("DELETE FROM cache")
+        
+        assert cache_db.get("https://test.com", "2025-10-27") == '{"test": "hot"}'
+        
+        monkeypatch.setattr(cache_db.settings, "MEMORY_CACHE_TTL_SECONDS", -1)
+        assert cache_db.get("https://test.com", "2025-10-27") is None
+    
+    def test_memory_cache_evicts_least_recently_used(self, monkeypatch):
+        """Test that the memory cache is bounded by MEMORY_CACHE_SIZE"""
+        monkeypatch.setattr(cache_db.settings, "MEMORY_CACHE_SIZE", 2)
+        cache_db.set("https://test1.com", "2025-10-27", '{"test": 1}')
+        cache_db.set("https://test2.com", "2025-10-27", '{"test": 2}')
+        cache_db.get("https://test1.com", "2025-10-27")
+        cache_db.set("https://test3.com", "2025-10-27", '{"test": 3}')
+        
+        assert ("https://test1.com", "2025-10-27") in cache_db._mem
+        assert ("https://test2.com", "2025-10-27") not in cache_db._mem
+        # Evicted entries are still read from SQLite
+        assert cache_db.get("https://test2.com", "2025-10-27") == '{"test": 2}'
+    
+    def test_async_get_serves_memory_hits_on_the_loop(self, monkeypatch):
+        """Test that aget answers memory hits without a worker thread"""
+        cache_db.set("https://test.com", "2025-10-27", '{"test": "hot"}')
+        
+        def no_thread(*args, **kwargs):
+            raise AssertionError("memory hit should not use a thread")
+        monkeypatch.setattr(cache_db.asyncio, "to_thread", no_thread)
+        
+        assert asyncio.run(cache_db.aget("https://test.com", "2025-10-27")) == '{"test": "hot"}'
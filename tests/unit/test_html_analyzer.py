@@ -1,105 +1,221 @@
+import sys
 import pytest
 from app.fetch.html_analyzer import (
     should_use_html_mode,
     extract_date_info_from_html,
     clean_html_for_llm,
-    get_menu_focused_html
+    clean_body_text_for_llm,
+    get_menu_focused_html,
+    parse_and_extract
 )
+from app.fetch.dom import parse_html
+
+# Pages only read by the analyzers; each is parsed once per session
+HTML_WITH_TABLE = """
+<html>
+<body>
+    <table class="menu">
+        <tr>
+            <td>Polévka</td>
+            <td>45,-</td>
+        </tr>
+        <tr>
+            <td>Hlavní chod</td>
+            <td>185 Kč</td>
+        </tr>
+    </table>
+</body>
+</html>
+"""
+
+HTML_WITH_LISTS = """
+<html>
+<body>
+    <ul class="menu-items">
+        <li>Polévka - 45,-</li>
+        <li>Řízek - 185,-</li>
+    </ul>
+    <ol>
+        <li>Item 1</li>
+        <li>Item 2</li>
+    </ol>
+</body>
+</html>
+"""
+
+HTML_WITH_MENU_CLASS = """
+<html>
+<body>
+    <div class="daily-menu">
+        <p>Today's special</p>
+    </div>
+</body>
+</html>
+"""
+
+SIMPLE_HTML = """
+<html>
+<body>
+    <p>Just some text without structure</p>
+</body>
+</html>
+"""
+
+HTML_MENU_WORD_IN_TEXT = """
+<html>
+<body>
+    <p>Naše MENU najdete na tabuli, cena dle dohody</p>
+    <ul><li>Jedna položka</li></ul>
+</body>
+</html>
+"""
+
+HTML_WITH_DATES = """
+<html>
+<body>
+    <h1>Menu na 27.10.2025</h1>
+    <p>Dnešní menu - středa</p>
+    <div>Denní menu pro pondělí</div>
+</body>
+</html>
+"""
+
+HTML_WITH_ISO = """
+<html>
+<body>
+    <time datetime="2025-10-27">Today</time>
+    <meta name="updated" content="2025-10-27T12:00:00">
+</body>
+</html>
+"""
+
+HTML_MULTI_DATES = """
+<div>
+    <span>27.10.2025</span>
+    <span>27.10.</span>
+    <span>2025-10-27</span>
+    <span>27/10/2025</span>
+</div>
+"""
+
+HTML_WEEKDAYS = """
+<div>
+    <p>pondělí speciál</p>
+    <p>Menu na ÚTERÝ</p>
+    <p>Středa - dnešní nabídka</p>
+    <h2>čtvrtek</h2>
+    <span>pá. speciálka</span>
+    <span>so menu</span>
+    <span>ne. brunch</span>
+</div>
+"""
+
+HTML_INDICATORS = """
+<div>
+    <h1>Denní menu</h1>
+    <h2>Daily menu special</h2>
+    <p>Menu dne</p>
+    <span>Dnes nabízíme</span>
+    <div>Polední menu</div>
+    <section>Lunch menu</section>
+    <p>Týdenní menu</p>
+    <h3>Jídelní lístek</h3>
+</div>
+"""
+
+
+@pytest.fixture(scope="session")
+def table_tree():
+    return parse_html(HTML_WITH_TABLE)
+
+
+@pytest.fixture(scope="session")
+def lists_tree():
+    return parse_html(HTML_WITH_LISTS)
+
+
+@pytest.fixture(scope="session")
+def menu_class_tree():
+    return parse_html(HTML_WITH_MENU_CLASS)
+
+
+@pytest.fixture(scope="session")
+def simple_tree():
+    return parse_html(SIMPLE_HTML)
+
+
+@pytest.fixture(scope="session")
+def menu_word_tree():
+    return parse_html(HTML_MENU_WORD_IN_TEXT)
+
+
+@pytest.fixture(scope="session")
+def dates_tree():
+    return parse_html(HTML_WITH_DATES)
+
+
+@pytest.fixture(scope="session")
+def iso_tree():
+    return parse_html(HTML_WITH_ISO)
+
+
+@pytest.fixture(scope="session")
+def multi_dates_tree():
+    return parse_html(HTML_MULTI_DATES)
+
+
+@pytest.fixture(scope="session")
+def weekdays_tree():
+    return parse_html(HTML_WEEKDAYS)
+
+
+@pytest.fixture(scope="session")
+def indicators_tree():
+    return parse_html(HTML_INDICATORS)
+
 
 class TestHtmlAnalyzer:
     """Unit tests for HTML analysis functionality"""
     
-    def test_should_use_html_mode_with_tables(self):
+    def test_should_use_html_mode_with_tables(self, table_tree):
         """Test HTML mode detection with table structure"""
-        html_with_table = """
-        <html>
-        <body>
-            <table class="menu">
-                <tr>
-                    <td>Polévka</td>
-                    <td>45,-</td>
-                </tr>
-                <tr>
-                    <td>Hlavní chod</td>
-                    <td>185 Kč</td>
-                </tr>
-            </table>
-        </body>
-        </html>
-        """
-        assert should_use_html_mode(html_with_table) is True
+        assert should_use_html_mode(HTML_WITH_TABLE) is True
+        assert should_use_html_mode(HTML_WITH_TABLE, tree=table_tree) is True
     
-    def test_should_use_html_mode_with_lists(self):
+    def test_should_use_html_mode_with_lists(self, lists_tree):
         """Test HTML mode detection with list structure"""
-        html_with_lists = """
-        <html>
-        <body>
-            <ul class="menu-items">
-                <li>Polévka - 45,-</li>
-                <li>Řízek - 185,-</li>
-            </ul>
-            <ol>
-                <li>Item 1</li>
-                <li>Item 2</li>
-            </ol>
-        </body>
-        </html>
-        """
-        assert should_use_html_mode(html_with_lists) is True
+        assert should_use_html_mode(HTML_WITH_LISTS) is True
+        assert should_use_html_mode(HTML_WITH_LISTS, tree=lists_tree) is True
     
-    def test_should_use_html_mode_with_menu_classes(self):
+    def test_should_use_html_mode_with_menu_classes(self, menu_class_tree):
         """Test HTML mode detection with menu-specific classes"""
-        html_with_menu_class = """
-        <html>
-        <body>
-            <div class="daily-menu">
-                <p>Today's special</p>
-            </div>
-        </body>
-        </html>
-        """
-        assert should_use_html_mode(html_with_menu_class) is True
+        assert should_use_html_mode(HTML_WITH_MENU_CLASS) is True
+        assert should_use_html_mode(HTML_WITH_MENU_CLASS, tree=menu_class_tree) is True
     
-    def test_should_use_text_mode_simple_html(self):
+    def test_should_use_text_mode_simple_html(self, simple_tree):
         """Test that simple HTML without structure uses text mode"""
-        simple_html = """
-        <html>
-        <body>
-            <p>Just some text without structure</p>
-        </body>
-        </html>
-        """
-        assert should_use_html_mode(simple_html) is False
+        assert should_use_html_mode(SIMPLE_HTML) is False
+        assert should_use_html_mode(SIMPLE_HTML, tree=simple_tree) is False
     
-    def test_extract_date_info_czech_dates(self):
+    def test_should_use_text_mode_menu_word_in_text(self, menu_word_tree):
+        """Test that 'menu' in plain text (not a class/id) does not trigger HTML mode"""
+        assert should_use_html_mode(HTML_MENU_WORD_IN_TEXT) is False
+        assert should_use_html_mode(HTML_MENU_WORD_IN_TEXT, tree=menu_word_tree) is False
+    
+    def test_extract_date_info_czech_dates(self, dates_tree):
         """Test extraction of Czech date formats"""
-        html_with_dates = """
-        <html>
-        <body>
-            <h1>Menu na 27.10.2025</h1>
-            <p>Dnešní menu - středa</p>
-            <div>Denní menu pro pondělí</div>
-        </body>
-        </html>
-        """
-        date_info = extract_date_info_from_html(html_with_dates)
+        date_info = extract_date_info_from_html(HTML_WITH_DATES, tree=dates_tree)
         
         assert "27.10.2025" in date_info["found_dates"]
         assert "středa" in date_info["found_weekdays"]
         assert "pondělí" in date_info["found_weekdays"]
         assert any("denní menu" in indicator.lower() for indicator in date_info["menu_type_indicators"])
+        # Parsing inside the analyzer gives the same result
+        assert extract_date_info_from_html(HTML_WITH_DATES) == date_info
     
-    def test_extract_date_info_iso_dates(self):
+    def test_extract_date_info_iso_dates(self, iso_tree):
         """Test extraction of ISO date formats"""
-        html_with_iso = """
-        <html>
-        <body>
-            <time datetime="2025-10-27">Today</time>
-            <meta name="updated" content="2025-10-27T12:00:00">
-        </body>
-        </html>
-        """
-        date_info = extract_date_info_from_html(html_with_iso)
+        date_info = extract_date_info_from_html(HTML_WITH_ISO, tree=iso_tree)
         
         assert "2025-10-27" in date_info["found_dates"]
     
@@ -134,7 +250,31 @@ class TestHtmlAnalyzer:
         # Should keep menu content
         assert "Today's Menu" in cleaned
         assert "Soup: 45,-" in cleaned
-    
+
+    def test_clean_html_for_llm_truncation(self):
+        """Test capped output is the prefix of the full output plus '...'"""
+        html = "<div class='menu'>" + "".join(
+            f"<p>Jídlo {i} &amp; příloha <b>{100 + i},-</b></p>" for i in range(200)
+        ) + "</div>"
+
+        full = clean_html_for_llm(html, max_length=10**6)
+        capped = clean_html_for_llm(html, max_length=500)
+
+        assert len(full) > 500
+        assert capped == full[:500] + "..."
+
+    def test_clean_body_text_skips_template_content(self):
+        """Test <template> content is left out of the body text, as BeautifulSoup does"""
+        html = """
+        <html>
+        <body>
+            <div class="menu"><p>Polévka 45,-</p><template>5.6.</template></div>
+        </body>
+        </html>
+        """
+
+        assert clean_body_text_for_llm(html) == "Polévka 45,-"
+
     def test_get_menu_focused_html(self):
         """Test extraction of menu-focused HTML"""
         html_with_menu = """
@@ -185,22 +325,49 @@ class TestHtmlAnalyzer:
         assert "Some restaurant content" in focused_html
         assert "150,-" in focused_html
         assert "<html>" in focused_html
+    
+    def test_html_cleanup_does_not_need_beautifulsoup(self, monkeypatch):
+        """Test the HTML cleanup paths run on lxml alone (no BeautifulSoup fallback)"""
+        # A None entry makes any `import bs4` raise ImportError
+        monkeypatch.setitem(sys.modules, "bs4", None)
+        assert "Polévka" in clean_html_for_llm(HTML_WITH_TABLE)
+        assert "Polévka" in get_menu_focused_html(HTML_WITH_LISTS)
+        assert "Polévka" in clean_body_text_for_llm(HTML_WITH_TABLE)
+    
+    def test_parse_and_extract(self):
+        """Test single-parse extraction of menu text and cleaned body, comments splitting text"""
+        html = """
+        <html>
+        <body>
+            <nav>Menu | Kontakt</nav>
+            <div class="cookie-banner">Používáme cookies pro lepší služby</div>
+            <div class="daily-menu">
+                <h2>Polední menu<!-- edited --> - středa</h2>
+                <p>Gulášová polévka (1,9)<!-- cena -->45,-</p>
+                <p>Svíčková na smetaně s knedlíkem (1,3,7) 185,-</p>
+            </div>
+            <footer>© Restaurace</footer>
+        </body>
+        </html>
+        """
+        
+        menu_text, cleaned_body = parse_and_extract(html)
+        
+        assert menu_text == (
+            "Polední menu - středa Gulášová polévka (1,9) 45,- "
+            "Svíčková na smetaně s knedlíkem (1,3,7) 185,-"
+        )
+        assert cleaned_body == (
+            "Polední menu\n- středa\nGulášová polévka (1,9)\n45,-\n"
+            "Svíčková na smetaně s knedlíkem (1,3,7) 185,-"
+        )
 
 class TestDateExtraction:
     """Specific tests for date and weekday extraction"""
     
-    def test_multiple_date_formats(self):
+    def test_multiple_date_formats(self, multi_dates_tree):
         """Test various date format recognition"""
-        html_multi_dates = """
-        <div>
-            <span>27.10.2025</span>
-            <span>27.10.</span>
-            <span>2025-10-27</span>
-            <span>27/10/2025</span>
-        </div>
-        """
-        
-        date_info = extract_date_info_from_html(html_multi_dates)
+        date_info = extract_date_info_from_html(HTML_MULTI_DATES, tree=multi_dates_tree)
         dates = date_info["found_dates"]
         
         assert "27.10.2025" in dates
@@ -208,21 +375,9 @@ class TestDateExtraction:
         assert "2025-10-27" in dates
         assert "27/10/2025" in dates
     
-    def test_weekday_variations(self):
+    def test_weekday_variations(self, weekdays_tree):
         """Test recognition of various weekday formats"""
-        html_weekdays = """
-        <div>
-            <p>pondělí speciál</p>
-            <p>Menu na ÚTERÝ</p>
-            <p>Středa - dnešní nabídka</p>
-            <h2>čtvrtek</h2>
-            <span>pá. speciálka</span>
-            <span>so menu</span>
-            <span>ne. brunch</span>
-        </div>
-        """
-        
-        date_info = extract_date_info_from_html(html_weekdays)
+        date_info = extract_date_info_from_html(HTML_WEEKDAYS, tree=weekdays_tree)
         weekdays = [wd.lower() for wd in date_info["found_weekdays"]]
         
         assert "pondělí" in weekdays
@@ -230,22 +385,9 @@ class TestDateExtraction:
         assert "středa" in weekdays
         assert "čtvrtek" in weekdays
     
-    def test_menu_type_indicators(self):
+    def test_menu_type_indicators(self, indicators_tree):
         """Test recognition of menu type indicators"""
-        html_indicators = """
-        <div>
-            <h1>Denní menu</h1>
-            <h2>Daily menu special</h2>
-            <p>Menu dne</p>
-            <span>Dnes nabízíme</span>
-            <div>Polední menu</div>
-            <section>Lunch menu</section>
-            <p>Týdenní menu</p>
-            <h3>Jídelní lístek</h3>
-        </div>
-        """
-        
-        date_info = extract_date_info_from_html(html_indicators)
+        date_info = extract_date_info_from_html(HTML_INDICATORS, tree=indicators_tree)
         indicators = [ind.lower() for ind in date_info["menu_type_indicators"]]
         
         assert "denní menu" in indicators
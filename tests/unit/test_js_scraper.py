@@ -0,0 +1,58 @@
+import pytest
+from app.fetch.js_scraper import extract_menu_text_js
+
+class TestExtractMenuTextJs:
+    """Unit tests for text extraction from rendered HTML"""
+    
+    def test_keeps_one_line_per_block(self):
+        """Test that separate menu blocks stay on separate lines"""
+        html = """
+        <html>
+        <body>
+            <div class="menu-soup">Polévka dne: Gulášová polévka 42 Kč</div>
+            <div class="menu-main">Kuřecí steak s bramborami 175 Kč</div>
+            <div class="menu-dessert">Jablečný štrúdl se šlehačkou 85 Kč</div>
+            <div class="menu-drink">Domácí limonáda s mátou 0.4l 55 Kč</div>
+            <div class="menu-extra">Polévka dne: Gulášová polévka 42 Kč</div>
+        </body>
+        </html>
+        """
+        
+        lines = extract_menu_text_js(html).split("\n")
+        
+        assert lines[0] == "Polévka dne: Gulášová polévka 42 Kč"
+        assert "Kuřecí steak s bramborami 175 Kč" in lines
+        assert len(lines) == 4
+    
+    def test_collapses_whitespace(self):
+        """Test that whitespace inside a block is collapsed"""
+        html = """
+        <html>
+        <body>
+            <div class="daily-menu">
+                <p>Svíčková   na
+                   smetaně 195,-</p>
+                <p>Smažený sýr s hranolkami 180,-</p>
+                <p>Grilovaná zelenina s bylinkovým máslem 155,-</p>
+                <p>Vařené brambory s máslem a petrželkou 20,-</p>
+            </div>
+        </body>
+        </html>
+        """
+        
+        text = extract_menu_text_js(html)
+        
+        assert "Svíčková na smetaně 195,-" in text
+        assert "\n" not in text
+    
+    def test_comment_separates_text(self):
+        """Test that text on either side of a comment stays two strings"""
+        html = """
+        <html>
+        <body>
+            <div class="menu-soup">Polévka dne<!-- dnes -->Gulášová polévka 42 Kč</div>
+        </body>
+        </html>
+        """
+        
+        assert extract_menu_text_js(html) == "Polévka dne Gulášová polévka 42 Kč"
@@ -0,0 +1,61 @@
+import pytest
+from app.fetch.scraper import extract_menu_text
+
+class TestExtractMenuText:
+    """Unit tests for static HTML text extraction"""
+    
+    def test_repeated_blocks_deduplicated(self):
+        """Test that each block is one line and repeated blocks appear once"""
+        html = """
+        <html>
+        <body>
+            <div>
+                <li>Polévka dne:   Gulášová
+                    polévka 42 Kč</li>
+                <li>Kuřecí steak s bramborami 175 Kč</li>
+                <li>Polévka dne: Gulášová polévka 42 Kč</li>
+            </div>
+        </body>
+        </html>
+        """
+        
+        lines = extract_menu_text(html).split("\n")
+        
+        assert lines.count("Polévka dne: Gulášová polévka 42 Kč") == 1
+        assert "Kuřecí steak s bramborami 175 Kč" in lines
+    
+    def test_nested_menu_blocks_not_repeated(self):
+        """Test that a menu container and its nested menu items are not both returned"""
+        html = """
+        <html>
+        <body>
+            <section class="daily-menu">
+                <h2>Denní menu - středa</h2>
+                <div class="menu-items">
+                    <p>Svíčková na smetaně (1,3,7,9) 195,-</p>
+                </div>
+            </section>
+        </body>
+        </html>
+        """
+        
+        text = extract_menu_text(html)
+        
+        assert text == "Denní menu - středa Svíčková na smetaně (1,3,7,9) 195,-"
+    
+    def test_comment_separates_text(self):
+        """Test that text on either side of a comment or PI stays two strings"""
+        html = """
+        <html>
+        <body>
+            <div class="daily-menu">
+                <p>Polévka dne<!-- dnes -->Gulášová polévka<?php echo 1 ?>42 Kč</p>
+                <p>Kuřecí steak s bramborami 175 Kč</p>
+            </div>
+        </body>
+        </html>
+        """
+        
+        text = extract_menu_text(html)
+        
+        assert text == "Polévka dne Gulášová polévka 42 Kč Kuřecí steak s bramborami 175 Kč"
@@ -1,3 +1,4 @@
+import re
 import pytest
 from app.fetch.utils import (
     normalize_price_human, 
@@ -9,103 +10,91 @@ from app.fetch.utils import (
 class TestPriceNormalization:
     """Unit tests for price normalization function"""
     
-    def test_czech_price_format(self):
-        """Test Czech price format with comma and dash"""
-        assert normalize_price_human("145,-") == 145
-        assert normalize_price_human("95,-") == 95
-    
-    def test_price_with_currency(self):
-        """Test price with currency symbols"""
-        assert normalize_price_human("120 Kč") == 120
-        assert normalize_price_human("85 CZK") == 85
-    
-    def test_decimal_prices(self):
-        """Test prices with decimal places"""
-        assert normalize_price_human("145.50") == 145
-        assert normalize_price_human("99,90") == 99
-    
-    def test_plain_numbers(self):
-        """Test plain number strings"""
-        assert normalize_price_human("75") == 75
-        assert normalize_price_human("250") == 250
-    
-    def test_invalid_inputs(self):
-        """Test handling of invalid inputs"""
-        assert normalize_price_human("") is None
-        assert normalize_price_human("bez ceny") is None
-        assert normalize_price_human(None) is None
+    @pytest.mark.parametrize("price_text, expected", [
+        # Czech price format with comma and dash
+        ("145,-", 145),
+        ("95,-", 95),
+        # Price with currency symbols
+        ("120 Kč", 120),
+        ("85 CZK", 85),
+        # Prices with decimal places
+        ("145.50", 145),
+        ("99,90", 99),
+        # Plain number strings
+        ("75", 75),
+        ("250", 250),
+        # Invalid inputs
+        ("", None),
+        ("bez ceny", None),
+        (None, None),
+    ])
+    def test_normalize_price(self, price_text, expected):
+        """Test price normalization across formats and invalid inputs"""
+        assert normalize_price_human(price_text) == expected
 
 class TestWeightConversion:
     """Unit tests for weight/volume conversion"""
     
-    def test_kilogram_to_gram(self):
-        """Test kg to g conversion"""
-        assert convert_weight_to_string("0,5 kg") == "500g"
-        assert convert_weight_to_string("1.2 kg") == "1200g"
-    
-    def test_liter_to_milliliter(self):
-        """Test l to ml conversion"""
-        assert convert_weight_to_string("0.33 l") == "330ml"
-        assert convert_weight_to_string("1,5 litr") == "1500ml"
-    
-    def test_direct_units(self):
-        """Test direct g/ml units"""
-        assert convert_weight_to_string("150g") == "150g"
-        assert convert_weight_to_string("500 ml") == "500ml"
-    
-    def test_portions(self):
-        """Test portion/piece units"""
-        assert convert_weight_to_string("2 ks") == "2 ks"
-        assert convert_weight_to_string("1 porce") == "1 porce"
-    
-    def test_invalid_weight_input(self):
-        """Test handling of invalid weight inputs"""
-        assert convert_weight_to_string("") is None
-        assert convert_weight_to_string("bez váhy") is None
+    @pytest.mark.parametrize("text, expected", [
+        # kg to g conversion
+        ("0,5 kg", "500g"),
+        ("1.2 kg", "1200g"),
+        # l to ml conversion
+        ("0.33 l", "330ml"),
+        ("1,5 litr", "1500ml"),
+        # Direct g/ml units
+        ("150g", "150g"),
+        ("500 ml", "500ml"),
+        # Portion/piece units
+        ("2 ks", "2 ks"),
+        ("1 porce", "1 porce"),
+        # Invalid weight inputs
+        ("", None),
+        ("bez váhy", None),
+    ])
+    def test_convert_weight(self, text, expected):
+        """Test weight/volume conversion across units and invalid inputs"""
+        assert convert_weight_to_string(text) == expected
 
 class TestAllergenExtraction:
     """Unit tests for allergen code extraction"""
     
-    def test_parentheses_format(self):
-        """Test allergen codes in parentheses"""
-        assert extract_allergens("Řízek (1,3,9)") == ["1", "3", "9"]
-        assert extract_allergens("Polévka (7)") == ["7"]
-    
-    def test_brackets_format(self):
-        """Test allergen codes in square brackets"""
-        assert extract_allergens("Salát [2,4,6]") == ["2", "4", "6"]
-    
-    def test_allergen_label(self):
-        """Test with 'alergeny:' label"""
-        assert extract_allergens("alergeny: 1,3,9") == ["1", "3", "9"]
-        assert extract_allergens("Alergény: 5, 8") == ["5", "8"]
-    
-    def test_no_allergens(self):
-        """Test text without allergens"""
-        assert extract_allergens("Čistý pokrm") == []
-        assert extract_allergens("") == []
-    
-    def test_duplicate_removal(self):
-        """Test removal of duplicate allergen codes"""
-        assert extract_allergens("Test (1,3,1) alergeny: 3,9") == ["1", "3", "9"]
+    @pytest.mark.parametrize("text, expected", [
+        # Allergen codes in parentheses
+        ("Řízek (1,3,9)", ["1", "3", "9"]),
+        ("Polévka (7)", ["7"]),
+        # Allergen codes in square brackets
+        ("Salát [2,4,6]", ["2", "4", "6"]),
+        # With 'alergeny:' label
+        ("alergeny: 1,3,9", ["1", "3", "9"]),
+        ("Alergény: 5, 8", ["5", "8"]),
+        # Text without allergens
+        ("Čistý pokrm", []),
+        ("", []),
+        # Duplicate codes are removed
+        ("Test (1,3,1) alergeny: 3,9", ["1", "3", "9"]),
+    ])
+    def test_extract_allergens(self, text, expected):
+        """Test allergen code extraction across formats"""
+        assert extract_allergens(text) == expected
 
 class TestWeekdayDetection:
     """Unit tests for Czech weekday detection"""
     
-    def test_full_weekday_names(self):
-        """Test detection of full Czech weekday names"""
-        assert detect_weekday_from_text("Dnešní menu - středa") == "středa"
-        assert detect_weekday_from_text("Pondělní speciálka") == "pondělí"
-    
-    def test_abbreviated_weekdays(self):
-        """Test detection of abbreviated weekdays"""
-        assert detect_weekday_from_text("Menu na st:") == "středa"
-        assert detect_weekday_from_text("Pá - 25.10.") == "pátek"
-    
-    def test_case_insensitive(self):
-        """Test case insensitive detection"""
-        assert detect_weekday_from_text("STŘEDA MENU") == "středa"
-        assert detect_weekday_from_text("pátek speciál") == "pátek"
+    @pytest.mark.parametrize("text, expected", [
+        # Full Czech weekday names
+        ("Dnešní menu - středa", "středa"),
+        ("Pondělní speciálka", "pondělí"),
+        # Abbreviated weekdays
+        ("Menu na st:", "středa"),
+        ("Pá - 25.10.", "pátek"),
+        # Case insensitive detection
+        ("STŘEDA MENU", "středa"),
+        ("pátek speciál", "pátek"),
+    ])
+    def test_detect_weekday(self, text, expected):
+        """Test weekday detection from full names, abbreviations and any case"""
+        assert detect_weekday_from_text(text) == expected
     
     def test_fallback_to_current(self):
         """Test fallback to current weekday when none detected"""
@@ -113,3 +102,21 @@ class TestWeekdayDetection:
         from app.fetch.utils import CZ_WEEKDAYS
         result = detect_weekday_from_text("Menu bez dne")
         assert result in CZ_WEEKDAYS
+
+class TestHotPathRegressions:
+    """Guards against slow code creeping back into the per-item utilities"""
+    
+    @pytest.mark.parametrize("func, arg", [
+        (normalize_price_human, "145,-"),
+        (convert_weight_to_string, "0,5 kg"),
+        (extract_allergens, "Řízek (1,3,9) alergeny: 7"),
+        (detect_weekday_from_text, "Menu na st:"),
+    ])
+    def test_no_regex_compiled_per_call(self, monkeypatch, func, arg):
+        """Test that only precompiled module-level patterns are used"""
+        # re.search/re.sub/re.compile etc. all go through re._compile;
+        # methods of already compiled patterns do not
+        def fail(*args, **kwargs):
+            raise AssertionError(f"{func.__name__} compiles a regex on every call")
+        monkeypatch.setattr(re, "_compile", fail)
+        func(arg)